@@ -9,7 +9,6 @@ import json
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from lib.config import Config
-from lib.darkprocess import DarkLib
 from lib.siril_utils import Siril
 
 DARK_LIBRARY_PATH = os.path.expanduser("~/darkLib")  # Par défaut : ~/darkLib
@@ -239,6 +238,9 @@ def main() -> None:
 
     os.makedirs(DARK_LIBRARY_PATH, exist_ok=True)
     
+    # Import différé : DarkLib charge astropy et numpy, inutiles pour --help
+    from lib.darkprocess import DarkLib
+    
     # Créer l'instance DarkLib
     darklib = DarkLib(config, force_recalc=args.force_recalc)
     
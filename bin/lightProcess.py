@@ -29,7 +29,6 @@ from pathlib import Path
 # Add the parent directory to the path to import the lib module
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from lib.lightprocessor import LightProcessor
 from lib.siril_utils import Siril
 from lib.config import Config
 
@@ -235,6 +234,10 @@ def main():
         "rejection_high": args.rejection_param2
     }
     
+    # Import différé : LightProcessor charge astropy et numpy, inutiles pour --help
+    # ou lorsque les arguments sont rejetés
+    from lib.lightprocessor import LightProcessor
+    
     # Traitement des images pour chaque répertoire de session
     total_sessions = len(session_dirs)
     successful_sessions = 0
@@ -34,8 +34,10 @@ def main():
         # List directory contents
         print(f"Directory listing of {directory_path.resolve()}:")
         
-        # Get all items in the directory
-        items = list(directory_path.iterdir())
+        # Get all items in the directory (scandir provides the entry type
+        # from the directory listing, without an extra stat per entry)
+        with os.scandir(directory_path) as it:
+            items = list(it)
         
         if not items:
             print("  (empty directory)")
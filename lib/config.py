@@ -2,6 +2,8 @@
 import os
 import json
 import logging
+import stat
+import tempfile
 
 
 class Config:
@@ -38,6 +40,8 @@ class Config:
         """
         self.config_file = config_file or os.path.expanduser("~/.siril_darklib_config.json")
         self._config = {}
+        # Contenu du fichier tel que lu ou écrit en dernier (évite une réécriture identique)
+        self._saved_content = None
         self.load()
     
     def load(self):
@@ -45,10 +49,13 @@ class Config:
         Charge la configuration depuis le fichier.
         Si le fichier n'existe pas ou est invalide, utilise les valeurs par défaut.
         """
+        self._saved_content = None
         if os.path.exists(self.config_file):
             try:
                 with open(self.config_file, "r") as f:
-                    self._config = json.load(f)
+                    content = f.read()
+                self._config = json.loads(content)
+                self._saved_content = content
                 logging.info(f"Configuration chargée depuis {self.config_file}")
             except Exception as e:
                 logging.warning(f"Erreur lors du chargement de la configuration: {e}")
@@ -61,6 +68,9 @@ class Config:
         """
         Sauvegarde la configuration dans le fichier.
         Normalise les chemins avant la sauvegarde.
+        L'écriture passe par un fichier temporaire renommé ensuite, afin qu'une
+        interruption ne laisse jamais un fichier de configuration tronqué.
+        Le fichier n'est pas réécrit si son contenu est inchangé.
         """
         try:
             # Normaliser les chemins
@@ -73,8 +83,40 @@ class Config:
             if "output_dir" in self._config:
                 self._config["output_dir"] = os.path.abspath(self._config["output_dir"])
             
-            with open(self.config_file, "w") as f:
-                json.dump(self._config, f, indent=2)
+            content = json.dumps(self._config, indent=2)
+            if content == self._saved_content and os.path.exists(self.config_file):
+                logging.info(f"Configuration inchangée, {self.config_file} n'est pas réécrit")
+                return True
+            
+            # Remplacer la cible d'un éventuel lien symbolique (le lien est conservé),
+            # avec les droits du fichier existant
+            target = os.path.realpath(self.config_file)
+            try:
+                mode = stat.S_IMODE(os.stat(target).st_mode)
+            except FileNotFoundError:
+                umask = os.umask(0)
+                os.umask(umask)
+                mode = 0o666 & ~umask
+            
+            # Nom temporaire unique : deux sauvegardes simultanées ne partagent pas le même fichier
+            tmp_file = None
+            try:
+                with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(target), prefix=".config_",
+                                                 suffix=".tmp", delete=False) as f:
+                    tmp_file = f.name
+                    f.write(content)
+                    f.flush()
+                    os.fchmod(f.fileno(), mode)
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, target)
+            except BaseException:
+                if tmp_file is not None:
+                    try:
+                        os.unlink(tmp_file)
+                    except FileNotFoundError:
+                        pass
+                raise
+            self._saved_content = content
             logging.info(f"Configuration sauvegardée dans {self.config_file}")
             return True
         except Exception as e:
@@ -4,9 +4,11 @@ DarkLib class for managing dark frame library.
 This module provides functionality to group, stack, and maintain master dark frames.
 """
 import os
+import sys
 import datetime
 import shutil
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from lib.fits_info import FitsInfo
 from lib.siril_utils import Siril
@@ -53,6 +55,9 @@ class DarkLib:
             'validation_stats': {}  # Dict[group_key, validation_summary]
         }
 
+        # Master darks de la bibliothèque, lus au premier besoin (voir read_existing_master_darks)
+        self._existing_master_darks: list[FitsInfo] | None = None
+
         # Créer les répertoires nécessaires
         os.makedirs(self.dark_library_path, exist_ok=True)
         os.makedirs(self.work_dir, exist_ok=True)
@@ -65,6 +70,7 @@ class DarkLib:
         dark_groups = {}
         skipped_files = []
         filtered_by_date = []  # Liste des fichiers filtrés par la date
+        filepaths = []  # Fichiers FITS trouvés dans les répertoires d'entrée
 
         for input_dir in input_dirs:
             if not os.path.isdir(input_dir):
@@ -75,25 +81,36 @@ class DarkLib:
             for root, _, files in os.walk(input_dir):
                 for filename in files:
                     if filename.lower().endswith(('.fit', '.fits')):
-                        filepath = os.path.join(root, filename)
-                        info = FitsInfo(filepath)
-                        group_key = None
-                        if info.validData():
-                            group_key = info.group_key(self.temperature_precision)
-                        if group_key and info.is_dark():
-                            dark_groups.setdefault(group_key, []).append(info)
-                        else:
-                            skipped_files.append(filepath)
+                        filepaths.append(os.path.join(root, filename))
+
+        # Lecture des en-têtes en parallèle : les lectures sont indépendantes et
+        # dominées par les entrées/sorties (map conserve l'ordre de parcours).
+        # Même règle de dimensionnement que pour les liens de LightProcessor._prepare_sequence.
+        max_workers = max(1, min(32, len(filepaths)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            infos = list(executor.map(FitsInfo, filepaths))
+
+        for info in infos:
+            group_key = None
+            if info.validData():
+                group_key = info.group_key(self.temperature_precision)
+            if group_key and info.is_dark():
+                dark_groups.setdefault(group_key, []).append(info)
+            else:
+                skipped_files.append(info.filepath)
 
         # Tri des groupes par date décroissante et filtrage par intervalle de temps
+        max_age = datetime.timedelta(days=self.max_age_days)
         for key in list(dark_groups.keys()):
             infos = dark_groups[key]
             infos.sort(key=lambda x: x.date_obs(), reverse=True)
             if infos:
-                latest_date = infos[0].date_obs()
-                max_age = datetime.timedelta(days=self.max_age_days)
-                filtered = [info for info in infos if (latest_date - info.date_obs()) <= max_age]
-                removed = [info for info in infos if (latest_date - info.date_obs()) > max_age]
+                # Date limite calculée une fois par groupe, fichiers répartis en une passe
+                oldest_allowed = infos[0].date_obs() - max_age
+                filtered = []
+                removed = []
+                for info in infos:
+                    (filtered if info.date_obs() >= oldest_allowed else removed).append(info)
                 dark_groups[key] = filtered
                 if removed:
                     filtered_by_date.extend(removed)
@@ -320,6 +337,8 @@ cd {process_dir}
         temp_master_dark_path = os.path.join(process_dir, siril_output_name)
         if os.path.exists(temp_master_dark_path):
             shutil.move(temp_master_dark_path, master_dark_path)
+            # La bibliothèque a changé : les master darks seront relus au prochain besoin
+            self._existing_master_darks = None
             logging.info(f"Master dark successfully created/updated: {master_dark_path}")
             
             # Enregistrer les données de traitement pour le rapport
@@ -352,7 +371,11 @@ cd {process_dir}
         """
         Parcourt le répertoire de la dark library et lit les entêtes FITS de chaque master dark.
         Retourne une liste d'objets FitsInfo représentant les master darks existants.
+        Le résultat est mémorisé jusqu'à la prochaine écriture d'un master dark par cette instance.
         """
+        if self._existing_master_darks is not None:
+            return list(self._existing_master_darks)
+
         existing_darks = []
         if not os.path.isdir(self.dark_library_path):
             return existing_darks
@@ -366,7 +389,8 @@ cd {process_dir}
                         existing_darks.append(info)
                 except Exception as e:
                     logging.warning(f"Impossible de lire l'entête FITS de {fpath}: {e}")
-        return existing_darks
+        self._existing_master_darks = existing_darks
+        return list(existing_darks)
 
     def list_master_darks(self) -> None:
         """
@@ -380,17 +404,20 @@ cd {process_dir}
             logging.info("Aucun master dark trouvé dans la bibliothèque.")
             return
         
-        # Calculate base length (sum of fixed width columns and spaces)
-        base_length = 25 + 1 + 10 + 1 + 10 + 1 + 8 + 1 + 10 + 1 + 20 + 1 + 8 + 1
-        
         # Calculate the maximum length needed for the variable part (command and filename)
+        # and the camera column width (at least 25, widened so that long names are not truncated)
         max_variable_length = len("Commande/Fichier")  # Start with header length
+        camera_width = 25
         for dark in existing_darks:
             filename = os.path.basename(dark.filepath)
             stack_cmd = dark.stack_command() if hasattr(dark, 'stack_command_value') and dark.stack_command() else "N/A"
             
             # Update max_variable_length if either stack_cmd or filename is longer
             max_variable_length = max(max_variable_length, len(stack_cmd), len(filename) + 2)  # +2 for "→ "
+            camera_width = max(camera_width, len(dark.camera()) + 1)
+        
+        # Calculate base length (sum of fixed width columns and spaces)
+        base_length = camera_width + 1 + 10 + 1 + 10 + 1 + 8 + 1 + 10 + 1 + 20 + 1 + 8 + 1
         
         # Calculate total max line length
         max_line_length = base_length + max_variable_length
@@ -399,14 +426,16 @@ cd {process_dir}
         separator = "-" * max_line_length
         
         # Affiche un en-tête pour le tableau avec colonne combinée
-        header = "{:<25} {:<10} {:<10} {:<8} {:<10} {:<20} {:<8} {:<}".format(
+        header = f"{{:<{camera_width}}} {{:<10}} {{:<10}} {{:<8}} {{:<10}} {{:<20}} {{:<8}} {{:<}}".format(
             "Caméra", "Temp (°C)", "Exp (s)", "Gain", "Binning", "Date d'observation", "N darks", "Commande/Fichier"
         )
         
-        print(f"\nListe des {len(existing_darks)} master darks disponibles :")
-        print(separator)
-        print(header)
-        print(separator)
+        # Le tableau est construit en mémoire puis écrit en une seule fois
+        lines = [f"\nListe des {len(existing_darks)} master darks disponibles :", separator, header, separator]
+        
+        # Formats des lignes préparés une fois pour tout le tableau
+        format_main_row = f"{{:<{camera_width}}} {{:<10.1f}} {{:<10.1f}} {{:<8.1f}} {{:<10}} {{:<20}} {{:<8}} {{:<}}".format
+        file_row_prefix = " " * base_length + "→ "
         
         for dark in sorted(existing_darks, key=lambda x: (x.exptime(), -x.temperature())):
             # Format des valeurs pour l'affichage
@@ -418,8 +447,8 @@ cd {process_dir}
             stack_cmd = dark.stack_command() if hasattr(dark, 'stack_command_value') and dark.stack_command() else "N/A"
             
             # Ligne principale avec les infos et la commande de stacking
-            main_row = "{:<25} {:<10.1f} {:<10.1f} {:<8.1f} {:<10} {:<20} {:<8} {:<}".format(
-                dark.camera()[:24], 
+            main_row = format_main_row(
+                dark.camera(), 
                 dark.temperature() if dark.temperature() is not None else float('nan'),
                 dark.exptime() if dark.exptime() is not None else float('nan'),
                 dark.gain() if dark.gain() is not None else float('nan'),
@@ -428,16 +457,14 @@ cd {process_dir}
                 n_darks,
                 stack_cmd
             )
-            print(main_row)
+            lines.append(main_row)
             
             # Ligne secondaire avec le nom du fichier (avec indentation)
-            file_row = "{:<25} {:<10} {:<10} {:<8} {:<10} {:<20} {:<8} → {}".format(
-                "", "", "", "", "", "", "", filename
-            )
-            print(file_row)
+            lines.append(file_row_prefix + filename)
         
-        print(separator)
-        print()  # Ligne vide à la fin pour améliorer la lisibilité
+        lines.append(separator)
+        lines.append("")  # Ligne vide à la fin pour améliorer la lisibilité
+        sys.stdout.write("\n".join(lines) + "\n")
 
     def process_all_groups(self, dark_groups, validate_darks: bool = False):
         """
@@ -488,7 +515,7 @@ cd {process_dir}
         if not updated_masters and not rejected_files:
             print("Aucun master dark mis à jour et aucun fichier rejeté.")
             # Afficher quand même l'état de la bibliothèque
-            self._display_library_status()
+            self.list_master_darks()
             print("=== FIN DU RAPPORT ===\n")
             return
         
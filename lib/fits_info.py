@@ -5,16 +5,44 @@ import logging
 import unicodedata
 import re
 import copy
+import functools
 import numpy as np
 from astropy.io import fits
 from astropy.time import Time
 
 
+# Mots-clés de température, par ordre de préférence
+_TEMPERATURE_KEYWORDS = ('CCD-TEMP', 'CCDTEMP', 'SET-TEMP', 'CCD_TEMP', 'SENSOR-TEMP', 'TEMP')
+# Mots-clés du nom de caméra, par ordre de préférence
+_CAMERA_KEYWORDS = ('INSTRUME', 'INSTRUMENT', 'CAMERA')
+
+
+@functools.lru_cache(maxsize=1024)
+def _read_primary_header(filepath: str, mtime_ns: int, size: int) -> fits.Header:
+    """
+    Lit l'en-tête primaire d'un fichier FITS.
+    Mémorisé par (chemin, date de modification, taille) : un fichier relu sans avoir
+    été modifié n'est pas rouvert, et toute modification invalide l'entrée.
+    L'en-tête retourné est partagé entre les lectures et ne doit pas être modifié.
+    """
+    # getheader ne lit que les blocs d'en-tête, sans construire la liste des HDU ni projeter les données
+    return fits.getheader(filepath, ext=0)
+
+
 class FitsInfo:
     """
     Objet pour lire et accéder facilement aux champs d'un fichier FITS dark.
     """
 
+    # Attributs fixes : pas de dictionnaire par instance (bibliothèques de milliers de fichiers)
+    __slots__ = (
+        'filepath', 'header', 'valid', 'log_level', 'fields',
+        'date_obs_value', 'rawdate_obs_value', 'exptime_value', 'temperature_value',
+        'gain_value', 'imagetyp_value', 'camera_value', 'xbinning_value', 'ybinning_value',
+        'ndarks_value', 'history_values', 'stack_command_value',
+        '_stats', '_group_key_cache',
+    )
+
     def __init__(self, filepath: str, log_level: int = logging.WARNING):
         self.filepath:str = filepath
         self.header = None
@@ -34,6 +62,10 @@ class FitsInfo:
         self.ndarks_value = None
         self.history_values = []
         self.stack_command_value = None
+        # Statistiques d'image, calculées à la première demande
+        self._stats = None
+        # Clés de groupement déjà calculées, par précision de température
+        self._group_key_cache = {}
         # Lecture des champs FITS
         self._read_header()
 
@@ -43,29 +75,35 @@ class FitsInfo:
 
     def _read_header(self) -> None:
         try:
-            with fits.open(self.filepath) as hdul:
-                self.header = hdul[0].header
+            st = os.stat(self.filepath)
+            self.header = _read_primary_header(self.filepath, st.st_mtime_ns, st.st_size)
             
-            # Auto-détection du mot-clé de température
+            header = self.header
+            
+            # Auto-détection du mot-clé de température (une seule recherche par mot-clé)
             temp_value = None
-            for keyword in ['CCD-TEMP', 'CCDTEMP', 'SET-TEMP', 'CCD_TEMP', 'SENSOR-TEMP', 'TEMP']:
-                if keyword in self.header:
-                    temp_value = self.header.get(keyword)
+            for keyword in _TEMPERATURE_KEYWORDS:
+                temp_value = header.get(keyword)
+                if temp_value is not None:
                     break
                     
-            camera_value = (
-                self.header.get('INSTRUME') or
-                self.header.get('INSTRUMENT') or
-                self.header.get('CAMERA', 'unknown')
-            )
+            camera_value = 'unknown'
+            for keyword in _CAMERA_KEYWORDS:
+                value = header.get(keyword)
+                if value:
+                    camera_value = value
+                    break
 
             # Attributs pour accès direct
-            self.rawdate_obs_value = self.header.get('DATE-OBS')
+            exptime = header.get('EXPTIME')
+            gain = header.get('GAIN')
+            imagetyp = header.get('IMAGETYP')
+            self.rawdate_obs_value = header.get('DATE-OBS')
             self.date_obs_value = self._parse_date(self.rawdate_obs_value)
-            self.exptime_value = float(self.header.get('EXPTIME')) if self.header.get('EXPTIME') is not None else None
+            self.exptime_value = float(exptime) if exptime is not None else None
             self.temperature_value = float(temp_value) if temp_value is not None else None
-            self.gain_value = float(self.header.get('GAIN')) if self.header.get('GAIN') is not None else None
-            self.imagetyp_value = (self.header.get('IMAGETYP') or '').strip().lower() if self.header.get('IMAGETYP') else ''
+            self.gain_value = float(gain) if gain is not None else None
+            self.imagetyp_value = imagetyp.strip().lower() if imagetyp else ''
             self.camera_value = self._normalize_camera_name(camera_value)
             
             # Lecture des champs NDARKS et HISTORY
@@ -193,6 +231,11 @@ class FitsInfo:
         Args:
             temperature_precision: Précision d'arrondi pour la température (par défaut 0.2°C)
         """
+        try:
+            return self._group_key_cache[temperature_precision]
+        except KeyError:
+            pass
+        
         if self.validData():
             rounded_temp = round(round(self.temperature() / temperature_precision) * temperature_precision, 1)
             rounded_gain = round(self.gain())
@@ -202,9 +245,11 @@ class FitsInfo:
             formatted_camera = self.camera()
             formatted_binning = self.binning()
             
-            return f"{formatted_camera}_T{formatted_temp}_E{formatted_exp}_G{formatted_gain}_B{formatted_binning}"
+            key = f"{formatted_camera}_T{formatted_temp}_E{formatted_exp}_G{formatted_gain}_B{formatted_binning}"
         else:
-            return None
+            key = None
+        self._group_key_cache[temperature_precision] = key
+        return key
 
     def is_equivalent(self, other: "FitsInfo", temperature_precision: float = 0.2) -> bool:
         """
@@ -235,17 +280,24 @@ class FitsInfo:
         Crée un lien symbolique vers le fichier FITS dans link_dir.
         Si index est fourni, le nom du lien sera dark_{index:04d}.fit, sinon le nom d'origine.
         """
-        if not os.path.exists(link_dir):
-            os.makedirs(link_dir, exist_ok=True)
         if index is not None:
             link_name = f"dark_{index:04d}.fit"
         else:
             link_name = os.path.basename(self.filepath)
         link_path = os.path.join(link_dir, link_name)
+        target = os.path.abspath(self.filepath)
         try:
-            if os.path.exists(link_path):
+            # Cas courant en un seul appel système ; les cas rares sont traités sur erreur
+            try:
+                os.symlink(target, link_path)
+            except FileExistsError:
+                # Remplacer le lien existant (y compris un lien cassé)
                 os.remove(link_path)
-            os.symlink(os.path.abspath(self.filepath), link_path)
+                os.symlink(target, link_path)
+            except FileNotFoundError:
+                # Répertoire des liens pas encore créé
+                os.makedirs(link_dir, exist_ok=True)
+                os.symlink(target, link_path)
             return self.copy_with_filepath(link_path)
         except Exception as e:
             logging.warning(f"Impossible de créer le lien symbolique {link_path} -> {self.filepath}: {e}")
@@ -312,6 +364,9 @@ class FitsInfo:
         except Exception as e:
             logging.error(f"Failed to update FITS header for {self.filepath}: {e}")
             raise
+        finally:
+            # Ne pas dépendre de la résolution de la date de modification du système de fichiers
+            _read_primary_header.cache_clear()
 
     def set_date_obs(self, value: str | datetime.datetime) -> None:
         self.rawdate_obs_value = value if isinstance(value, str) else value.isoformat()
@@ -319,15 +374,20 @@ class FitsInfo:
 
     def set_exptime(self, value: float) -> None:
         self.exptime_value = float(value)
+        # Nouveau dictionnaire plutôt que clear() : les copies (copy_with_filepath) partagent l'ancien
+        self._group_key_cache = {}
 
     def set_temperature(self, value: float) -> None:
         self.temperature_value = float(value)
+        self._group_key_cache = {}
 
     def set_gain(self, value: float) -> None:
         self.gain_value = float(value)
+        self._group_key_cache = {}
 
     def set_camera(self, value: str) -> None:
         self.camera_value = self._normalize_camera_name(value)
+        self._group_key_cache = {}
 
     def set_ndarks(self, value: int) -> None:
         """
@@ -364,9 +424,14 @@ class FitsInfo:
         Analyse les statistiques de l'image FITS pour détecter des anomalies.
         Retourne un dictionnaire avec les statistiques clés.
         
+        Le résultat est mémorisé sur l'instance : les appels suivants (par exemple
+        is_valid_dark avec d'autres seuils) ne relisent ni ne réanalysent l'image.
+        
         Returns:
             dict: Statistiques de l'image (médiane, écart-type, percentiles, etc.)
         """
+        if self._stats is not None:
+            return self._stats
         try:
             with fits.open(self.filepath) as hdul:
                 data = hdul[0].data
@@ -434,6 +499,7 @@ class FitsInfo:
                 stats['hot_pixels_count'] = int(hot_pixels)
                 stats['hot_pixels_percent'] = float(hot_pixels / data.size * 100)
                 
+                self._stats = stats
                 return stats
                 
         except Exception as e:
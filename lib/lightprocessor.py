@@ -14,6 +14,7 @@ from typing import List, Dict, Optional, Tuple
 import glob
 import shutil
 import os
+from concurrent.futures import ThreadPoolExecutor
 from lib.fits_info import FitsInfo
 from lib.siril_utils import Siril
 
@@ -27,6 +28,14 @@ class LightProcessor:
     le prétraitement et stacking automatique.
     """
     
+    # Paramètres de stacking utilisés lorsqu'ils ne sont pas précisés
+    DEFAULT_STACK_PARAMS = {
+        "method": "average",
+        "rejection": "sigma",
+        "rejection_low": 3.0,
+        "rejection_high": 3.0
+    }
+    
     def __init__(self, 
                  session_dir: Path,
                  dark_library_path: str,
@@ -55,6 +64,9 @@ class LightProcessor:
         self.force_reprocess = force_reprocess
         self.dry_run = dry_run
         
+        # Index des master darks par group_key, construit au premier besoin (voir _get_master_dark_index)
+        self._master_dark_index: Optional[Dict[str, List[Tuple[str, FitsInfo]]]] = None
+        
         # Initialisation de l'instance Siril avec la configuration par défaut
         self.siril = Siril.create_with_defaults()
         
@@ -173,24 +185,20 @@ class LightProcessor:
         
         return groups
     
-    def find_matching_master_dark(self, light_info: FitsInfo) -> Optional[Path]:
+    def _get_master_dark_index(self, dark_lib_path: Path) -> Dict[str, List[Tuple[str, FitsInfo]]]:
         """
-        Trouve le master dark correspondant aux caractéristiques du light.
+        Retourne l'index des master darks de la librairie, groupés par group_key.
+        La librairie n'est parcourue et les en-têtes lus qu'une seule fois par
+        instance, quel que soit le nombre de groupes de lights traités.
         
         Args:
-            light_info: Information du fichier light
+            dark_lib_path: Chemin vers la librairie de master darks
             
         Returns:
-            Chemin vers le master dark correspondant ou None si non trouvé
+            Dictionnaire group_key -> liste de (chemin, FitsInfo), dans l'ordre de parcours
         """
-        if not self.dark_library_path:
-            logging.warning("Aucune librairie de darks spécifiée")
-            return None
-        
-        dark_lib_path = Path(self.dark_library_path)
-        if not dark_lib_path.exists():
-            logging.error(f"Librairie de darks introuvable: {dark_lib_path}")
-            return None
+        if self._master_dark_index is not None:
+            return self._master_dark_index
         
         # Extensions FITS supportées
         extensions = ["*.fit", "*.fits", "*.FIT", "*.FITS"]
@@ -201,7 +209,7 @@ class LightProcessor:
             pattern = str(dark_lib_path / "**" / ext)
             master_dark_files.extend(glob.glob(pattern, recursive=True))
         
-        # Analyser chaque master dark pour trouver une correspondance
+        index: Dict[str, List[Tuple[str, FitsInfo]]] = {}
         for dark_file in master_dark_files:
             try:
                 dark_info = FitsInfo(dark_file)
@@ -212,23 +220,52 @@ class LightProcessor:
                 if not dark_info.is_dark():
                     continue
                 
-                # Vérifier la correspondance des caractéristiques
-                if light_info.is_equivalent(dark_info, self.temp_precision):
-                    logging.info(f"Master dark trouvé: {dark_file}")
-                    logging.info(f"  Light: T={light_info.temperature()}°C, "
-                               f"Exp={light_info.exptime()}s, "
-                               f"Gain={light_info.gain()}, "
-                               f"Caméra={light_info.camera()}")
-                    logging.info(f"  Dark:  T={dark_info.temperature()}°C, "
-                               f"Exp={dark_info.exptime()}s, "
-                               f"Gain={dark_info.gain()}, "
-                               f"Caméra={dark_info.camera()}")
-                    return Path(dark_file)
+                index.setdefault(dark_info.group_key(self.temp_precision), []).append((dark_file, dark_info))
                     
             except Exception as e:
-                logging.debug(f"Erreur lors de l'analyse du dark {dark_file}: {e}")
+                logging.debug("Erreur lors de l'analyse du dark %s: %s", dark_file, e)
                 continue
         
+        logging.debug("Index des master darks: %d fichiers, %d groupes",
+                      sum(len(darks) for darks in index.values()), len(index))
+        self._master_dark_index = index
+        return index
+    
+    def find_matching_master_dark(self, light_info: FitsInfo) -> Optional[Path]:
+        """
+        Trouve le master dark correspondant aux caractéristiques du light.
+        
+        Args:
+            light_info: Information du fichier light
+            
+        Returns:
+            Chemin vers le master dark correspondant ou None si non trouvé
+        """
+        if not self.dark_library_path:
+            logging.warning("Aucune librairie de darks spécifiée")
+            return None
+        
+        dark_lib_path = Path(self.dark_library_path)
+        if not dark_lib_path.exists():
+            logging.error(f"Librairie de darks introuvable: {dark_lib_path}")
+            return None
+        
+        # Seuls les master darks de même group_key peuvent correspondre
+        candidates = self._get_master_dark_index(dark_lib_path).get(light_info.group_key(self.temp_precision), [])
+        for dark_file, dark_info in candidates:
+            # Vérifier la correspondance des caractéristiques
+            if light_info.is_equivalent(dark_info, self.temp_precision):
+                logging.info(f"Master dark trouvé: {dark_file}")
+                logging.info(f"  Light: T={light_info.temperature()}°C, "
+                           f"Exp={light_info.exptime()}s, "
+                           f"Gain={light_info.gain()}, "
+                           f"Caméra={light_info.camera()}")
+                logging.info(f"  Dark:  T={dark_info.temperature()}°C, "
+                           f"Exp={dark_info.exptime()}s, "
+                           f"Gain={dark_info.gain()}, "
+                           f"Caméra={dark_info.camera()}")
+                return Path(dark_file)
+        
         logging.warning(f"Aucun master dark correspondant trouvé pour: "
                        f"T={light_info.temperature()}°C, "
                        f"Exp={light_info.exptime()}s, "
@@ -239,7 +276,7 @@ class LightProcessor:
     
     def _prepare_sequence(self, sequence_name: str, light_files: List[str]) -> bool:
         """
-        Prépare une séquence en créant les liens symboliques.
+        Prépare une séquence en créant les liens (physiques ou symboliques) vers les fichiers light.
         
         Args:
             sequence_name: Nom de la séquence
@@ -254,24 +291,61 @@ class LightProcessor:
             # Créer le répertoire de la séquence
             sequence_dir.mkdir(parents=True, exist_ok=True)
             
-            # Créer les liens symboliques avec la convention Siril
-            for i, file_path in enumerate(light_files):
-                source_path = Path(file_path).resolve()
-                if not source_path.exists():
+            # Résoudre tous les chemins puis vérifier leur existence en une passe,
+            # afin de signaler tous les fichiers manquants d'un coup
+            source_paths = self._resolve_sources(light_files)
+            missing = self._find_missing_sources(source_paths)
+            if missing:
+                for source_path in missing:
                     logging.error(f"Fichier source inexistant: {source_path}")
-                    return False
-                
+                return False
+            
+            # Créer les liens avec la convention Siril.
+            # Les créations sont indépendantes et limitées par les appels système :
+            # elles sont réparties sur un pool de threads (map conserve l'ordre).
+            sequence_dir_str = str(sequence_dir)
+            link_prefix = f"{sequence_name}_"
+            
+            # Un lien physique évite à Siril de résoudre un lien symbolique à chaque lecture,
+            # mais n'est possible que sur le même système de fichiers (un stat par répertoire source)
+            sequence_dev = os.stat(sequence_dir_str).st_dev
+            same_device = {}
+            for source_path in source_paths:
+                if source_path.parent not in same_device:
+                    same_device[source_path.parent] = os.stat(source_path.parent).st_dev == sequence_dev
+            
+            def _link_one(i: int, source_path: Path) -> Optional[str]:
                 # Nom du lien selon la convention Siril
-                link_name = f"{sequence_name}_{i:04d}.fit"
-                link_path = sequence_dir / link_name
-                
-                # Supprimer le lien existant s'il y en a un
-                if link_path.exists():
-                    link_path.unlink()
-                
-                # Créer le lien symbolique
-                link_path.symlink_to(source_path)
-                logging.debug(f"Lien créé: {link_path} -> {source_path}")
+                link_path = os.path.join(sequence_dir_str, f"{link_prefix}{i:04d}.fit")
+                try:
+                    # Supprimer le lien existant s'il y en a un (y compris un lien cassé)
+                    try:
+                        os.unlink(link_path)
+                    except FileNotFoundError:
+                        pass
+                    
+                    # Créer un lien physique si possible, sinon un lien symbolique
+                    # (certains systèmes de fichiers refusent les liens physiques)
+                    if same_device[source_path.parent]:
+                        try:
+                            os.link(source_path, link_path)
+                        except OSError:
+                            os.symlink(source_path, link_path)
+                    else:
+                        os.symlink(source_path, link_path)
+                except OSError as e:
+                    return f"{link_path} -> {source_path}: {e}"
+                logging.debug("Lien créé: %s -> %s", link_path, source_path)
+                return None
+            
+            max_workers = max(1, min(32, len(source_paths)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                errors = [error for error in executor.map(_link_one, range(len(source_paths)), source_paths)
+                          if error is not None]
+            if errors:
+                for error in errors:
+                    logging.error(f"Impossible de créer le lien {error}")
+                return False
             
             logging.info(f"Séquence '{sequence_name}' préparée avec {len(light_files)} fichiers")
             return True
@@ -280,6 +354,42 @@ class LightProcessor:
             logging.error(f"Erreur lors de la préparation de la séquence {sequence_name}: {e}")
             return False
     
+    @staticmethod
+    def _resolve_sources(light_files: List[str]) -> List[Path]:
+        """
+        Résout les chemins absolus des fichiers source.
+        Le répertoire parent n'est résolu qu'une fois par répertoire (les fichiers
+        d'une séquence partagent en général le même), plutôt qu'un resolve() par fichier.
+        
+        Args:
+            light_files: Liste des chemins vers les fichiers light
+            
+        Returns:
+            Liste des chemins absolus, dans le même ordre
+        """
+        resolved_parents = {}
+        source_paths = []
+        for file_path in light_files:
+            dirname, basename = os.path.split(os.fspath(file_path))
+            parent = resolved_parents.get(dirname)
+            if parent is None:
+                parent = resolved_parents[dirname] = Path(dirname).resolve(strict=False)
+            source_paths.append(parent / basename)
+        return source_paths
+    
+    @staticmethod
+    def _find_missing_sources(source_paths: List[Path]) -> List[Path]:
+        """
+        Retourne les fichiers source inexistants (un stat par fichier).
+        
+        Args:
+            source_paths: Chemins absolus des fichiers source
+            
+        Returns:
+            Liste des chemins inexistants
+        """
+        return [source_path for source_path in source_paths if not source_path.exists()]
+    
     def _cleanup_sequence(self, sequence_name: str) -> None:
         """
         Nettoie les fichiers temporaires de la séquence.
@@ -288,14 +398,81 @@ class LightProcessor:
             sequence_name: Nom de la séquence à nettoyer
         """
         sequence_dir = self.work_dir / sequence_name
-        if sequence_dir.exists():
+        try:
+            # Le répertoire ne contient normalement que des liens : suppression à plat
+            with os.scandir(sequence_dir) as it:
+                for entry in it:
+                    os.unlink(entry.path)
+            os.rmdir(sequence_dir)
+            logging.debug(f"Répertoire de séquence nettoyé: {sequence_dir}")
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # Contenu inattendu (sous-répertoire...) : suppression récursive
             try:
                 shutil.rmtree(sequence_dir)
                 logging.debug(f"Répertoire de séquence nettoyé: {sequence_dir}")
             except Exception as e:
                 logging.warning(f"Erreur lors du nettoyage de {sequence_dir}: {e}")
     
-    def _generate_siril_script(self, sequence_name: str, group_key: str, dark_path: str, stack_params: dict = None) -> str:
+    @staticmethod
+    def _normalize_stack_params(stack_params: Optional[Dict]) -> Dict:
+        """
+        Complète les paramètres de stacking avec les valeurs par défaut.
+        
+        Args:
+            stack_params: Paramètres de stacking (éventuellement partiels ou None)
+            
+        Returns:
+            Nouveau dictionnaire contenant toutes les clés de DEFAULT_STACK_PARAMS
+        """
+        normalized = dict(LightProcessor.DEFAULT_STACK_PARAMS)
+        if stack_params:
+            normalized.update(stack_params)
+        return normalized
+    
+    def _conversion_manifest(self, light_files: List[Path]) -> str:
+        """
+        Construit la description des fichiers sources d'une conversion
+        (chemin résolu, taille et date de modification de chaque fichier).
+        
+        Args:
+            light_files: Liste des chemins vers les fichiers light
+            
+        Returns:
+            Contenu du fichier de description, une ligne par fichier source
+        """
+        lines = []
+        for source_path in self._resolve_sources(light_files):
+            st = os.stat(source_path)
+            lines.append(f"{source_path}\t{st.st_size}\t{st.st_mtime_ns}")
+        return "\n".join(lines) + "\n"
+    
+    def _is_conversion_reusable(self, sequence_name: str, light_files: List[Path]) -> bool:
+        """
+        Vérifie si le répertoire de traitement contient déjà la conversion
+        de la séquence pour exactement les mêmes fichiers light.
+        
+        Args:
+            sequence_name: Nom de la séquence
+            light_files: Liste des chemins vers les fichiers light
+            
+        Returns:
+            True si l'étape convert peut être omise, False sinon
+        """
+        process_dir = self.work_dir / "process"
+        try:
+            recorded = (process_dir / f"{sequence_name}.sources").read_text()
+            if recorded != self._conversion_manifest(light_files):
+                return False
+        except OSError:
+            return False
+        
+        return ((process_dir / f"{sequence_name}_.seq").exists()
+                and (process_dir / f"{sequence_name}_{len(light_files):05d}.fit").exists())
+    
+    def _generate_siril_script(self, sequence_name: str, group_key: str, dark_path: str, stack_params: dict = None,
+                               skip_convert: bool = False) -> str:
         """
         Génère le script Siril pour le traitement complet.
         
@@ -303,24 +480,20 @@ class LightProcessor:
             sequence_name: Nom de la séquence
             group_key: Clé du groupe pour le nom de fichier final
             dark_path: Chemin vers le fichier master dark
-            stack_params: Paramètres de stacking
+            stack_params: Paramètres de stacking normalisés (voir _normalize_stack_params)
+            skip_convert: Omettre la conversion, la séquence étant déjà convertie dans le répertoire de traitement
             
         Returns:
             Contenu du script Siril
         """
         # Paramètres par défaut si non spécifiés
         if stack_params is None:
-            stack_params = {
-                "method": "average",
-                "rejection": "sigma", 
-                "rejection_low": 3.0,
-                "rejection_high": 3.0
-            }
+            stack_params = self._normalize_stack_params(None)
         
         # Construire la commande stack avec les paramètres de rejection
-        rejection_method = stack_params.get("rejection", "sigma")
-        rejection_low = stack_params.get("rejection_low", 3.0)
-        rejection_high = stack_params.get("rejection_high", 3.0)
+        rejection_method = stack_params["rejection"]
+        rejection_low = stack_params["rejection_low"]
+        rejection_high = stack_params["rejection_high"]
         
         # Créer le répertoire de traitement
         process_dir = self.work_dir / "process"
@@ -334,9 +507,14 @@ class LightProcessor:
         pyecho_path = script_dir / "pyecho.py"
         pydir_path = script_dir / "pydir.py"
         
-        # Script Siril pour le traitement complet
-        script_content = f"""requires 1.2
-cd {sequence_dir}
+        # Conversion de la séquence vers le répertoire de traitement
+        if skip_convert:
+            convert_block = f"""cd {process_dir}
+pyscript {pyecho_path} "====================================================================="
+pyscript {pyecho_path} "Reuse sequence {sequence_name} already converted in {process_dir}"
+"""
+        else:
+            convert_block = f"""cd {sequence_dir}
 pyscript {pyecho_path} "====================================================================="
 pyscript {pyecho_path} "Convert Light Frames to .fit files"
 pyscript {pyecho_path} "Convert files to sequence."
@@ -344,7 +522,11 @@ pyscript {pyecho_path} "cmd:========> convert {sequence_name} -out={process_dir}
 convert {sequence_name} -out={process_dir}
 cd {process_dir}
 pyscript {pydir_path}
-pyscript {pyecho_path} "====================================================================="
+"""
+        
+        # Script Siril pour le traitement complet
+        script_content = f"""requires 1.2
+{convert_block}pyscript {pyecho_path} "====================================================================="
 pyscript {pyecho_path} "Pre-process Light Frames (calibration with dark subtraction)"
 pyscript {pyecho_path} "cmd:========> calibrate {sequence_name} -dark={dark_path} -cc=dark -cfa -debayer"
 calibrate {sequence_name} -dark={dark_path} -cc=dark -cfa -debayer
@@ -390,6 +572,9 @@ close"""
         
         logging.info(f"Traitement du groupe '{group_key}' ({len(light_infos)} images)")
         
+        # Paramètres de stacking complétés une seule fois pour tout le traitement du groupe
+        stack_params = self._normalize_stack_params(stack_params)
+        
         # Prendre le premier light comme référence pour les caractéristiques
         reference_light = light_infos[0]
         
@@ -418,32 +603,38 @@ close"""
         if not self.dry_run:
             self.output_dir.mkdir(parents=True, exist_ok=True)
         
+        # Une conversion précédente des mêmes fichiers peut être réutilisée (ex: essais de paramètres de stacking)
+        process_dir = self.work_dir / "process"
+        skip_convert = self._is_conversion_reusable(sequence_name, light_files)
+        if skip_convert:
+            logging.info(f"Séquence '{sequence_name}' déjà convertie dans {process_dir}, conversion omise")
+        
         if self.dry_run:
             logging.info(f"[DRY-RUN] Traiterait {len(light_files)} lights avec dark {master_dark_path}")
             logging.info(f"[DRY-RUN] Sortie: {final_output}")
             
             # Générer et afficher le script Siril en mode dry-run
             try:
-                script_content = self._generate_siril_script(sequence_name, group_key, str(master_dark_path), stack_params)
-                logging.info(f"[DRY-RUN] Script Siril qui serait généré:")
+                script_content = self._generate_siril_script(sequence_name, group_key, str(master_dark_path), stack_params,
+                                                             skip_convert=skip_convert)
+                logging.info("[DRY-RUN] Script Siril qui serait généré:")
                 for i, line in enumerate(script_content.split('\n'), 1):
                     if line.strip():
-                        logging.info(f"[DRY-RUN]   {i:2d}: {line}")
+                        logging.info("[DRY-RUN]   %2d: %s", i, line)
             except Exception as e:
                 logging.warning(f"[DRY-RUN] Impossible de générer le script Siril: {e}")
             
             return True
         
         try:
-            # Préparer la séquence (créer les liens symboliques)
-            if not self._prepare_sequence(sequence_name, light_files):
+            # Préparer la séquence (créer les liens), inutile si la conversion est réutilisée
+            if not skip_convert and not self._prepare_sequence(sequence_name, light_files):
                 logging.error(f"Échec de la préparation de la séquence {sequence_name}")
                 return False
             
             try:
                 # Nettoyer le répertoire de traitement existant pour un démarrage propre
-                process_dir = self.work_dir / "process"
-                if process_dir.exists():
+                if not skip_convert and process_dir.exists():
                     try:
                         shutil.rmtree(process_dir)
                         logging.debug(f"Répertoire de traitement nettoyé: {process_dir}")
@@ -455,18 +646,22 @@ close"""
                 process_dir.mkdir(parents=True, exist_ok=True)
                 
                 # Générer et exécuter le script Siril
-                script_content = self._generate_siril_script(sequence_name, group_key, str(master_dark_path), stack_params)
+                script_content = self._generate_siril_script(sequence_name, group_key, str(master_dark_path), stack_params,
+                                                             skip_convert=skip_convert)
                 
                 logging.info(f"Executing complete light processing workflow for sequence {sequence_name}")
-                if stack_params:
-                    method = stack_params.get("method", "average")
-                    rejection = stack_params.get("rejection", "sigma")
-                    rejection_low = stack_params.get("rejection_low", 3.0)
-                    rejection_high = stack_params.get("rejection_high", 3.0)
-                    logging.info(f"Stack parameters: method={method}, rejection={rejection} {rejection_low} {rejection_high}")
+                logging.info(f"Stack parameters: method={stack_params['method']}, "
+                             f"rejection={stack_params['rejection']} {stack_params['rejection_low']} {stack_params['rejection_high']}")
                 
                 success = self.siril.run_siril_script(script_content, str(self.work_dir))
                 
+                if success and not skip_convert:
+                    # Mémoriser les fichiers sources de la conversion pour un prochain traitement
+                    try:
+                        (process_dir / f"{sequence_name}.sources").write_text(self._conversion_manifest(light_files))
+                    except OSError as e:
+                        logging.warning(f"Impossible d'enregistrer la description de la conversion: {e}")
+                
                 if success:
                     # Vérifier que le fichier final a été créé directement dans output_dir
                     if final_output.exists():
@@ -1,11 +1,96 @@
 #!/bin/env python3
-from datetime import time
 import os
 import subprocess
 import logging
+import collections
 import shutil
-from pathlib import Path
-from typing import List, Optional
+import stat
+import tempfile
+import functools
+from typing import Optional, Tuple
+
+__all__ = ['Siril', 'run_siril_script']
+
+# Nombre de lignes de sortie de Siril conservées pour le diagnostic d'un échec
+_OUTPUT_TAIL_LINES = 200
+
+
+@functools.lru_cache(maxsize=64)
+def _which_cached(name: str, path_env: Optional[str], pathext_env: Optional[str]) -> Optional[str]:
+    """
+    Recherche mémorisée d'une commande dans le PATH.
+    Les variables PATH et PATHEXT font partie de la clé : leur modification
+    entraîne une nouvelle recherche.
+    """
+    return shutil.which(name)
+
+
+@functools.lru_cache(maxsize=32)
+def _validate(siril_path: str, siril_mode: str) -> bool:
+    """
+    Vérifie qu'une configuration Siril (path, mode) est utilisable sur ce système.
+    Mémorisé : les vérifications (sous-processus flatpak, recherche de l'exécutable)
+    ne sont exécutées qu'une fois par couple (path, mode).
+    
+    Returns:
+        True si la configuration est valide, False sinon
+    """
+    try:
+        # Validation du mode
+        valid_modes = ["native", "flatpak", "appimage"]
+        if siril_mode not in valid_modes:
+            logging.error(f"Mode Siril invalide: {siril_mode}. Modes valides: {valid_modes}")
+            return False
+        
+        # Validation selon le mode
+        if siril_mode == "flatpak":
+            # Un seul appel : 'flatpak info' échoue directement si Siril n'est pas
+            # installé, sans lister toutes les applications
+            try:
+                result = subprocess.run(["flatpak", "info", "org.siril.Siril"],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+            except FileNotFoundError:
+                logging.error("Flatpak n'est pas disponible sur ce système")
+                return False
+            if result.returncode != 0:
+                logging.error("Siril n'est pas installé via Flatpak")
+                return False
+                
+        elif siril_mode in ["native", "appimage"]:
+            if os.sep not in siril_path:
+                # Nom de commande nu : résolu dans le PATH, comme le fera subprocess
+                # (un fichier du même nom dans le répertoire courant n'est pas utilisé)
+                if not _which_cached(siril_path, os.environ.get("PATH"), os.environ.get("PATHEXT")):
+                    logging.error(f"Exécutable Siril introuvable: {siril_path}")
+                    return False
+            else:
+                # Chemin explicite : un seul stat pour vérifier l'existence et les droits d'exécution
+                try:
+                    st = os.stat(siril_path)
+                except OSError:
+                    logging.error(f"Exécutable Siril introuvable: {siril_path}")
+                    return False
+                if not stat.S_ISREG(st.st_mode) or not st.st_mode & 0o111:
+                    logging.error(f"Le fichier Siril n'est pas exécutable: {siril_path}")
+                    return False
+        
+        logging.info("Configuration Siril validée: mode=%s, path=%s", siril_mode, siril_path)
+        return True
+        
+    except Exception as e:
+        logging.error(f"Erreur lors de la validation de la configuration Siril: {e}")
+        return False
+
+
+def _command_prefix(siril_path: str, siril_mode: str) -> Tuple[str, ...]:
+    """
+    Retourne le début de la ligne de commande Siril pour le mode donné,
+    à compléter par le chemin du script.
+    """
+    if siril_mode == "flatpak":
+        return ("flatpak", "run", "org.siril.Siril", "-s")
+    # Modes 'native' et 'appimage' : exécutable appelé directement
+    return (siril_path, "-s")
 
 
 class Siril:
@@ -31,6 +116,7 @@ class Siril:
         self._siril_path = siril_path if siril_path is not None else self._default_siril_path
         self._siril_mode = siril_mode if siril_mode is not None else self._default_siril_mode
         self._validated = False
+        self._cmd_prefix: Optional[Tuple[str, ...]] = None
         
         # Validation lors de l'initialisation
         if not self._validate_configuration():
@@ -49,22 +135,23 @@ class Siril:
         Raises:
             ValueError: Si la configuration n'est pas valide
         """
+        old_path, old_mode = cls._default_siril_path, cls._default_siril_mode
         if siril_path is not None:
             cls._default_siril_path = siril_path
         if siril_mode is not None:
             cls._default_siril_mode = siril_mode
         
-        # Validation immédiate de la nouvelle configuration
-        temp_instance = cls()
-        if not temp_instance._validated:
+        # Validation immédiate de la nouvelle configuration (le constructeur lève ValueError)
+        cls.invalidate_validation_cache()
+        try:
+            cls()
+        except ValueError:
             # Restaurer les anciennes valeurs en cas d'échec
-            if siril_path is not None:
-                cls._default_siril_path = "siril"
-            if siril_mode is not None:
-                cls._default_siril_mode = "flatpak"
-            raise ValueError(f"Configuration Siril invalide: path='{cls._default_siril_path}', mode='{cls._default_siril_mode}'")
+            cls._default_siril_path, cls._default_siril_mode = old_path, old_mode
+            raise
         
-        logging.info(f"Configuration Siril globale mise à jour et validée: path={cls._default_siril_path}, mode={cls._default_siril_mode}")
+        logging.info("Configuration Siril globale mise à jour et validée: path=%s, mode=%s",
+                     cls._default_siril_path, cls._default_siril_mode)
     
     @classmethod
     def get_default_config(cls) -> tuple[str, str]:
@@ -97,10 +184,11 @@ class Siril:
         old_path = self._siril_path
         self._siril_path = path
         self._validated = False
-        if not self._validate_configuration():
+        if not self._validate_configuration(refresh=True):
             # Restaurer l'ancienne valeur en cas d'échec
             self._siril_path = old_path
             self._validated = True  # L'ancienne configuration était valide
+            self._cmd_prefix = _command_prefix(self._siril_path, self._siril_mode)
             raise ValueError(f"Chemin Siril invalide: '{path}'")
     
     @property
@@ -114,10 +202,11 @@ class Siril:
         old_mode = self._siril_mode
         self._siril_mode = mode
         self._validated = False
-        if not self._validate_configuration():
+        if not self._validate_configuration(refresh=True):
             # Restaurer l'ancienne valeur en cas d'échec
             self._siril_mode = old_mode
             self._validated = True  # L'ancienne configuration était valide
+            self._cmd_prefix = _command_prefix(self._siril_path, self._siril_mode)
             raise ValueError(f"Mode Siril invalide: '{mode}'")
     
     @property
@@ -125,64 +214,41 @@ class Siril:
         """Retourne True si la configuration a été validée avec succès."""
         return self._validated
     
-    def _validate_configuration(self) -> bool:
+    @classmethod
+    def invalidate_validation_cache(cls):
+        """
+        Vide le cache des validations afin que la prochaine validation
+        relance les vérifications sur le système.
+        Les instances partagées par run_siril_script sont également oubliées.
+        """
+        _validate.cache_clear()
+        _which_cached.cache_clear()
+        _get_siril.cache_clear()
+    
+    def _validate_configuration(self, refresh: bool = False) -> bool:
         """
         Valide la configuration Siril actuelle.
+        Le résultat est mémorisé par couple (path, mode) pour éviter de relancer
+        les sous-processus de vérification à chaque nouvelle instance.
+        
+        Args:
+            refresh: Revérifie ce couple sur le système sans passer par le cache
+                     (les autres configurations mémorisées ne sont pas touchées)
         
         Returns:
             True si la configuration est valide, False sinon
         """
-        try:
-            # Validation du mode
-            valid_modes = ["native", "flatpak", "appimage"]
-            if self._siril_mode not in valid_modes:
-                logging.error(f"Mode Siril invalide: {self._siril_mode}. Modes valides: {valid_modes}")
-                self._validated = False
-                return False
-            
-            # Validation selon le mode
-            if self._siril_mode == "flatpak":
-                # Vérifier si flatpak est disponible
-                result = subprocess.run(["flatpak", "--version"], 
-                                      capture_output=True, text=True, check=False)
-                if result.returncode != 0:
-                    logging.error("Flatpak n'est pas disponible sur ce système")
-                    self._validated = False
-                    return False
-                
-                # Vérifier si Siril est installé via flatpak
-                result = subprocess.run(["flatpak", "list", "--app"], 
-                                      capture_output=True, text=True, check=False)
-                if result.returncode != 0 or "org.siril.Siril" not in result.stdout:
-                    logging.error("Siril n'est pas installé via Flatpak")
-                    self._validated = False
-                    return False
-                    
-            elif self._siril_mode in ["native", "appimage"]:
-                # Vérifier si l'exécutable existe et est accessible
-                if not shutil.which(self._siril_path) and not os.path.isfile(self._siril_path):
-                    logging.error(f"Exécutable Siril introuvable: {self._siril_path}")
-                    self._validated = False
-                    return False
-                
-                # Vérifier si le fichier est exécutable
-                if os.path.isfile(self._siril_path) and not os.access(self._siril_path, os.X_OK):
-                    logging.error(f"Le fichier Siril n'est pas exécutable: {self._siril_path}")
-                    self._validated = False
-                    return False
-            
-            logging.info(f"Configuration Siril validée: mode={self._siril_mode}, path={self._siril_path}")
-            self._validated = True
-            return True
-            
-        except Exception as e:
-            logging.error(f"Erreur lors de la validation de la configuration Siril: {e}")
-            self._validated = False
-            return False
+        validate = _validate.__wrapped__ if refresh else _validate
+        self._validated = validate(self._siril_path, self._siril_mode)
+        self._cmd_prefix = _command_prefix(self._siril_path, self._siril_mode) if self._validated else None
+        return self._validated
     
     def run_siril_script(self, siril_script_content: str, working_dir: str) -> bool:
         """
         Exécute un script Siril temporaire en utilisant la configuration de l'instance.
+        La sortie de Siril est lue ligne par ligne et transmise au journal (niveau DEBUG)
+        au lieu d'être conservée en mémoire ; seules les dernières lignes sont gardées
+        pour le diagnostic en cas d'échec.
         
         Args:
             siril_script_content: Contenu du script Siril à exécuter
@@ -196,39 +262,40 @@ class Siril:
             logging.error("Configuration Siril non valide. Impossible d'exécuter le script.")
             return False
         
-        script_path = os.path.join(working_dir, "siril_script.sps")
+        script_path = None
         try:
-            with open(script_path, "w") as f:
+            # Nom unique : plusieurs exécutions peuvent partager le même working_dir
+            with tempfile.NamedTemporaryFile("w", prefix="siril_script_", suffix=".sps",
+                                             dir=working_dir, delete=False) as f:
+                script_path = f.name
                 f.write(siril_script_content)
 
-            logging.info(f"Exécution du script Siril {script_path} dans {working_dir}:\n{siril_script_content}")
+            logging.info("Exécution du script Siril %s dans %s:\n%s", script_path, working_dir, siril_script_content)
 
-            # Construction de la commande selon le mode
-            if self._siril_mode == "native":
-                cmd = [self._siril_path, "-s", script_path]
-            elif self._siril_mode == "flatpak":
-                cmd = ["flatpak", "run", "org.siril.Siril", "-s", script_path]
-            elif self._siril_mode == "appimage":
-                cmd = [self._siril_path, "-s", script_path]
-            else:
-                logging.error(f"Mode Siril inconnu: {self._siril_mode}")
-                return False
+            # Commande précalculée lors de la validation
+            cmd = [*self._cmd_prefix, script_path]
 
-            result = subprocess.run(
+            tail = collections.deque(maxlen=_OUTPUT_TAIL_LINES)
+            with subprocess.Popen(
                 cmd,
                 cwd=working_dir,
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
                 text=True,
-                check=False
-            )
-            if result.returncode != 0:
-                logging.error(f"Le script Siril a échoué avec le code d'erreur {result.returncode}.")
-                logging.error(f"Stdout Siril:\n{result.stdout}")
-                logging.error(f"Stderr Siril:\n{result.stderr}")
+                bufsize=1
+            ) as process:
+                for line in process.stdout:
+                    line = line.rstrip()
+                    tail.append(line)
+                    logging.debug("Siril: %s", line)
+                returncode = process.wait()
+            
+            if returncode != 0:
+                logging.error(f"Le script Siril a échoué avec le code d'erreur {returncode}.")
+                logging.error("Sortie Siril (%d dernières lignes):\n%s", len(tail), "\n".join(tail))
                 return False
             else:
                 logging.info("Script Siril exécuté avec succès.")
-                logging.debug(f"Stdout Siril:\n{result.stdout}")
                 return True
         except FileNotFoundError:
             logging.error(f"Exécutable Siril introuvable à '{self._siril_path}'. Veuillez vérifier le chemin.")
@@ -237,8 +304,21 @@ class Siril:
             logging.error(f"Erreur lors de l'exécution du script Siril: {e}")
             return False
         finally:
-            if os.path.exists(script_path):
-                os.remove(script_path)  # Nettoyage du script temporaire
+            # Nettoyage du script temporaire
+            if script_path is not None:
+                try:
+                    os.unlink(script_path)
+                except OSError:
+                    pass
+
+
+@functools.lru_cache(maxsize=8)
+def _get_siril(siril_path: str, siril_mode: str) -> Siril:
+    """
+    Retourne une instance Siril partagée pour le couple (path, mode),
+    afin que les appels répétés de compatibilité ne reconstruisent pas d'instance.
+    """
+    return Siril(siril_path=siril_path, siril_mode=siril_mode)
 
 
 # Fonction de compatibilité pour maintenir l'ancienne interface
@@ -257,8 +337,7 @@ def run_siril_script(siril_script_content: str, working_dir: str, siril_path: st
     Returns:
         True si l'exécution a réussi, False sinon
     """
-    siril_instance = Siril(siril_path=siril_path, siril_mode=siril_mode)
-    return siril_instance.run_siril_script(siril_script_content, working_dir)
+    return _get_siril(siril_path, siril_mode).run_siril_script(siril_script_content, working_dir)
 
 
 
@@ -7,15 +7,76 @@ import os
 import json
 import numpy as np
 from pathlib import Path
-from astropy.io import fits
-from astropy.time import Time
 import sys
 
-# Ajouter le répertoire lib au path pour les imports
-sys.path.insert(0, str(Path(__file__).parent.parent / 'lib'))
+# Ajouter la racine du projet au path : les modules sont importés via le package lib,
+# comme dans bin/ et dans lib/ lui-même (un seul nom, donc une seule copie, par module)
+sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from config import Config
-from fits_info import FitsInfo
+from lib.config import Config
+
+
+def _normal_uint16(mean: float | np.ndarray, sigma: float, shape: tuple, seed: int) -> np.ndarray:
+    """
+    Génère une image de bruit gaussien au format uint16, reproductible (graine fixe).
+    Le bruit est tiré en float32 puis borné à [0, 65535] en place avant conversion,
+    sans tableau intermédiaire float64.
+    mean peut être un tableau diffusable sur shape pour générer une pile d'images
+    de moyennes différentes en un seul tirage.
+    """
+    rng = np.random.default_rng(seed)
+    data = rng.standard_normal(shape, dtype=np.float32)
+    data *= sigma
+    data += mean
+    np.clip(data, 0, 65535, out=data)
+    return data.astype(np.uint16)
+
+
+def _fits_card(key: str, value) -> str:
+    """Formate une carte d'en-tête FITS de 80 caractères (format fixe)"""
+    if isinstance(value, bool):
+        value = "T" if value else "F"
+        return f"{key:<8}= {value:>20}".ljust(80)
+    if isinstance(value, str):
+        value = "'" + f"{value:<8}" + "'"
+        return f"{key:<8}= {value}".ljust(80)
+    return f"{key:<8}= {value!r:>20}".ljust(80)
+
+
+# Cartes communes à tous les fichiers de test, formatées une seule fois
+_FITS_HEADER_START = "".join([
+    _fits_card("SIMPLE", True),
+    _fits_card("BITPIX", 16),
+    _fits_card("NAXIS", 2),
+])
+_FITS_HEADER_END = "".join([
+    _fits_card("BZERO", 32768),
+    _fits_card("BSCALE", 1),
+    "END".ljust(80),
+])
+
+
+def _write_fits(filepath: Path, data: np.ndarray, header: dict) -> None:
+    """
+    Écrit un fichier FITS minimal (HDU primaire uint16) sans passer par astropy :
+    en-tête en blocs de 2880 octets suivi des données entières signées big-endian
+    décalées de BZERO, comme le fait astropy pour des données uint16.
+    Seules les dimensions et les mots-clés propres au fichier sont formatés.
+    """
+    height, width = data.shape
+    cards = [
+        _FITS_HEADER_START,
+        _fits_card("NAXIS1", width),
+        _fits_card("NAXIS2", height),
+    ]
+    cards.extend(_fits_card(key, value) for key, value in header.items())
+    cards.append(_FITS_HEADER_END)
+
+    header_bytes = "".join(cards).encode("ascii")
+    header_bytes += b" " * (-len(header_bytes) % 2880)
+    data_bytes = (data.astype(np.int32) - 32768).astype(">i2").tobytes()
+    data_bytes += b"\0" * (-len(data_bytes) % 2880)
+    filepath.write_bytes(header_bytes + data_bytes)
 
 
 @pytest.fixture
@@ -25,6 +86,63 @@ def temp_dir():
         yield Path(temp_dir)
 
 
+@pytest.fixture
+def fake_siril(temp_dir):
+    """Exécutable factice jouant le rôle de Siril en mode natif"""
+    filepath = temp_dir / "siril"
+    filepath.write_text("#!/bin/sh\nexit 0\n")
+    os.chmod(filepath, 0o755)
+    return str(filepath)
+
+
+@pytest.fixture
+def native_siril(fake_siril, monkeypatch):
+    """
+    Configure par défaut l'exécutable Siril factice en mode natif.
+    La configuration par défaut d'origine (éventuellement invalide sur cette machine,
+    donc non reconfigurable) est rétablie par monkeypatch en fin de test.
+    """
+    from lib.siril_utils import Siril
+
+    old_path, old_mode = Siril.get_default_config()
+    monkeypatch.setattr(Siril, "_default_siril_path", old_path)
+    monkeypatch.setattr(Siril, "_default_siril_mode", old_mode)
+    Siril.configure_defaults(siril_path=fake_siril, siril_mode="native")
+    yield fake_siril
+    Siril.invalidate_validation_cache()
+
+
+@pytest.fixture(scope="session")
+def fits_dir(tmp_path_factory):
+    """
+    Répertoire des fichiers FITS de test, créés une seule fois pour toute la session.
+    Ces fichiers sont partagés : un test qui doit les modifier travaille sur une copie.
+    """
+    return tmp_path_factory.mktemp("fits")
+
+
+@pytest.fixture(scope="session")
+def fits_info_cache():
+    """
+    Retourne une fonction donnant le FitsInfo d'un fichier, construit une seule fois
+    par session tant que le fichier n'est pas modifié (clé : chemin, date de modification).
+    Les instances sont partagées : réservé aux tests qui ne les modifient pas.
+    """
+    # Import local : astropy n'est chargé que par les tests qui lisent des FITS
+    from lib.fits_info import FitsInfo
+
+    cache = {}
+
+    def get(filepath: str) -> "FitsInfo":
+        key = (filepath, os.stat(filepath).st_mtime_ns)
+        info = cache.get(key)
+        if info is None:
+            info = cache[key] = FitsInfo(filepath)
+        return info
+
+    return get
+
+
 @pytest.fixture
 def sample_config():
     """Configuration de test avec valeurs par défaut"""
@@ -40,17 +158,16 @@ def sample_config():
     }
 
 
-@pytest.fixture
-def valid_dark_fits(temp_dir):
+@pytest.fixture(scope="session")
+def valid_dark_fits(fits_dir):
     """Crée un fichier FITS dark valide pour les tests"""
-    filepath = temp_dir / "valid_dark.fit"
+    filepath = fits_dir / "valid_dark.fit"
     
     # Créer données d'image simulées (dark valide)
-    data = np.random.normal(100, 15, (100, 100)).astype(np.uint16)
-    data = np.clip(data, 0, 65535)
+    data = _normal_uint16(100, 15, (100, 100), seed=1)
     
     # Créer en-tête FITS
-    header = fits.Header()
+    header = {}
     header['IMAGETYP'] = 'dark'
     header['EXPTIME'] = 300.0
     header['CCD-TEMP'] = -15.0
@@ -61,27 +178,25 @@ def valid_dark_fits(temp_dir):
     header['DATE-OBS'] = '2023-10-27T20:00:00'
     
     # Sauvegarder le fichier FITS
-    hdu = fits.PrimaryHDU(data=data, header=header)
-    hdu.writeto(filepath, overwrite=True)
+    _write_fits(filepath, data, header)
     
     return str(filepath)
 
 
-@pytest.fixture  
-def invalid_dark_fits(temp_dir):
+@pytest.fixture(scope="session")
+def invalid_dark_fits(fits_dir):
     """Crée un fichier FITS dark invalide (capot ouvert) pour les tests"""
-    filepath = temp_dir / "invalid_dark.fit"
+    filepath = fits_dir / "invalid_dark.fit"
     
     # Créer données avec lumière parasite (valeurs élevées)
-    data = np.random.normal(300, 100, (100, 100)).astype(np.uint16)
-    data = np.clip(data, 0, 65535)
+    data = _normal_uint16(300, 100, (100, 100), seed=2)
     
     # Ajouter quelques "étoiles" (pixels très brillants)
     data[25:27, 25:27] = 2000
     data[75:77, 75:77] = 1800
     
     # Créer en-tête FITS  
-    header = fits.Header()
+    header = {}
     header['IMAGETYP'] = 'dark'
     header['EXPTIME'] = 300.0
     header['CCD-TEMP'] = -15.0
@@ -92,23 +207,21 @@ def invalid_dark_fits(temp_dir):
     header['DATE-OBS'] = '2023-10-27T20:00:00'
     
     # Sauvegarder le fichier FITS
-    hdu = fits.PrimaryHDU(data=data, header=header)
-    hdu.writeto(filepath, overwrite=True)
+    _write_fits(filepath, data, header)
     
     return str(filepath)
 
 
-@pytest.fixture
-def bias_fits(temp_dir):
+@pytest.fixture(scope="session")
+def bias_fits(fits_dir):
     """Crée un fichier FITS bias pour les tests"""
-    filepath = temp_dir / "bias.fit"
+    filepath = fits_dir / "bias.fit"
     
     # Créer données bias (très faibles valeurs)
-    data = np.random.normal(50, 5, (100, 100)).astype(np.uint16)
-    data = np.clip(data, 0, 65535)
+    data = _normal_uint16(50, 5, (100, 100), seed=3)
     
     # Créer en-tête FITS
-    header = fits.Header()
+    header = {}
     header['IMAGETYP'] = 'bias'
     header['EXPTIME'] = 0.0
     header['CCD-TEMP'] = -15.0
@@ -119,8 +232,7 @@ def bias_fits(temp_dir):
     header['DATE-OBS'] = '2023-10-27T20:00:00'
     
     # Sauvegarder le fichier FITS
-    hdu = fits.PrimaryHDU(data=data, header=header)
-    hdu.writeto(filepath, overwrite=True)
+    _write_fits(filepath, data, header)
     
     return str(filepath)
 
@@ -133,20 +245,20 @@ def config_instance(temp_dir):
     return config
 
 
-@pytest.fixture
-def sample_dark_group(temp_dir):
+@pytest.fixture(scope="session")
+def sample_dark_group(fits_dir):
     """Groupe de fichiers dark similaires pour tests de groupement"""
     files = []
     
-    for i in range(3):
-        filepath = temp_dir / f"dark_{i:02d}.fit"
-        
-        # Données similaires mais légèrement différentes
-        data = np.random.normal(100 + i*2, 15, (50, 50)).astype(np.uint16)
-        data = np.clip(data, 0, 65535)
+    # Données similaires mais légèrement différentes, générées en un seul tirage
+    means = 100 + 2 * np.arange(3, dtype=np.float32).reshape(3, 1, 1)
+    stack = _normal_uint16(means, 15, (3, 50, 50), seed=10)
+    
+    for i, data in enumerate(stack):
+        filepath = fits_dir / f"dark_{i:02d}.fit"
         
         # En-têtes identiques (même groupe)
-        header = fits.Header()
+        header = {}
         header['IMAGETYP'] = 'dark'
         header['EXPTIME'] = 300.0
         header['CCD-TEMP'] = -15.0 + i*0.1  # Variation minime de température
@@ -156,8 +268,7 @@ def sample_dark_group(temp_dir):
         header['YBINNING'] = 1
         header['DATE-OBS'] = f'2023-10-27T20:{i:02d}:00'
         
-        hdu = fits.PrimaryHDU(data=data, header=header)
-        hdu.writeto(filepath, overwrite=True)
+        _write_fits(filepath, data, header)
         files.append(str(filepath))
     
     return files
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+Tests unitaires pour le module config.py
+Tests le chargement et la sauvegarde de la configuration JSON.
+"""
+import os
+import json
+
+from lib.config import Config
+
+
+class TestConfigSave:
+    """Tests pour la sauvegarde de la configuration"""
+
+    def test_save_and_reload(self, temp_dir, sample_config):
+        """Test qu'une configuration sauvegardée est relue à l'identique"""
+        config_file = str(temp_dir / "config.json")
+        config = Config(config_file)
+        config.update(**sample_config)
+
+        assert config.save() is True
+
+        reloaded = Config(config_file)
+        assert reloaded.get("siril_mode") == "flatpak"
+        assert reloaded.get("rejection_param1") == 3.0
+        assert reloaded.get("dark_library_path") == os.path.abspath(sample_config["dark_library_path"])
+        assert os.listdir(temp_dir) == ["config.json"]
+
+    def test_unchanged_config_not_rewritten(self, temp_dir, sample_config):
+        """Test qu'une configuration inchangée ne réécrit pas le fichier"""
+        config_file = str(temp_dir / "config.json")
+        config = Config(config_file)
+        config.update(**sample_config)
+        config.save()
+        os.utime(config_file, ns=(0, 0))
+
+        assert Config(config_file).save() is True
+        assert os.stat(config_file).st_mtime_ns == 0
+
+        config.set("max_age_days", 30)
+        assert config.save() is True
+        assert os.stat(config_file).st_mtime_ns != 0
+        with open(config_file) as f:
+            assert json.load(f)["max_age_days"] == 30
+
+    def test_failed_save_keeps_previous_file(self, temp_dir, sample_config):
+        """Test qu'un échec de sérialisation laisse le fichier précédent intact"""
+        config_file = str(temp_dir / "config.json")
+        config = Config(config_file)
+        config.update(**sample_config)
+        config.save()
+
+        config.set("input_dirs", object())
+        assert config.save() is False
+
+        with open(config_file) as f:
+            assert json.load(f)["siril_mode"] == "flatpak"
+
+    def test_symlink_target_updated_in_place(self, temp_dir, sample_config):
+        """Test qu'un fichier de configuration lié symboliquement garde son lien et ses droits"""
+        target = temp_dir / "real_config.json"
+        target.write_text("{}")
+        os.chmod(target, 0o640)
+        link = temp_dir / "config.json"
+        link.symlink_to(target)
+
+        config = Config(str(link))
+        config.update(**sample_config)
+        assert config.save() is True
+
+        assert link.is_symlink()
+        assert os.stat(target).st_mode & 0o777 == 0o640
+        with open(target) as f:
+            assert json.load(f)["siril_mode"] == "flatpak"
@@ -0,0 +1,63 @@
+"""
+Tests unitaires pour le module darkprocess.py
+Tests le groupement des fichiers dark.
+"""
+import os
+import shutil
+import pytest
+
+from lib.darkprocess import DarkLib
+
+
+@pytest.fixture
+def darklib(temp_dir, native_siril):
+    """DarkLib configurée avec un exécutable Siril factice en mode natif"""
+    return DarkLib({
+        "dark_library_path": str(temp_dir / "darklib"),
+        "work_dir": str(temp_dir / "work"),
+        "temperature_precision": 0.2,
+    })
+
+
+class TestGroupDarkFiles:
+    """Tests pour le groupement des fichiers dark"""
+
+    def test_darks_grouped_and_others_skipped(self, darklib, temp_dir, valid_dark_fits, bias_fits):
+        """Test que les darks sont groupés dans l'ordre de parcours et que les autres fichiers sont ignorés"""
+        input_dir = temp_dir / "darks"
+        input_dir.mkdir()
+        for i in range(3):
+            shutil.copy(valid_dark_fits, input_dir / f"dark_{i}.fit")
+        shutil.copy(bias_fits, input_dir / "bias.fit")
+        (input_dir / "notes.txt").write_text("")
+
+        groups = darklib.group_dark_files([str(input_dir)], log_groups=False)
+
+        assert list(groups) == ["TestCamera_T-15.0_E300_G125_B1x1"]
+        assert sorted(os.path.basename(info.filepath) for info in groups["TestCamera_T-15.0_E300_G125_B1x1"]) == [
+            "dark_0.fit", "dark_1.fit", "dark_2.fit"]
+
+    def test_missing_input_dir(self, darklib, temp_dir):
+        """Test qu'un répertoire d'entrée absent est ignoré"""
+        assert darklib.group_dark_files([str(temp_dir / "absent")], log_groups=False) == {}
+
+
+class TestReadExistingMasterDarks:
+    """Tests pour la lecture des master darks de la bibliothèque"""
+
+    def test_library_read_once(self, darklib, valid_dark_fits, bias_fits):
+        """Test que la bibliothèque n'est lue qu'une fois et que les autres images sont ignorées"""
+        shutil.copy(valid_dark_fits, os.path.join(darklib.dark_library_path, "master.fit"))
+        shutil.copy(bias_fits, os.path.join(darklib.dark_library_path, "bias.fit"))
+
+        first = darklib.read_existing_master_darks()
+        os.remove(os.path.join(darklib.dark_library_path, "master.fit"))
+
+        assert [os.path.basename(info.filepath) for info in first] == ["master.fit"]
+        assert [info.filepath for info in darklib.read_existing_master_darks()] == [first[0].filepath]
+
+    def test_report_without_update(self, darklib, capsys):
+        """Test que le rapport sans mise à jour affiche l'état de la bibliothèque"""
+        darklib.generate_processing_report()
+
+        assert "Aucun master dark mis à jour" in capsys.readouterr().out
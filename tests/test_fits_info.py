@@ -2,19 +2,21 @@
 Tests unitaires pour le module fits_info.py
 Tests la lecture FITS, validation des darks, et statistiques d'image.
 """
+import shutil
 import pytest
 import numpy as np
 from pathlib import Path
 
-from fits_info import FitsInfo
+from lib import fits_info
+from lib.fits_info import FitsInfo
 
 
 class TestFitsInfoBasic:
     """Tests de base pour la classe FitsInfo"""
     
-    def test_valid_dark_detection(self, valid_dark_fits):
+    def test_valid_dark_detection(self, valid_dark_fits, fits_info_cache):
         """Test que les darks valides sont correctement détectés"""
-        info = FitsInfo(valid_dark_fits)
+        info = fits_info_cache(valid_dark_fits)
         
         assert info.is_dark() is True
         assert info.validData() is True
@@ -24,9 +26,9 @@ class TestFitsInfoBasic:
         assert info.camera() == "TestCamera"
         assert info.binning() == "1x1"
 
-    def test_invalid_dark_detection(self, invalid_dark_fits):
+    def test_invalid_dark_detection(self, invalid_dark_fits, fits_info_cache):
         """Test que les darks invalides sont correctement détectés"""
-        info = FitsInfo(invalid_dark_fits)
+        info = fits_info_cache(invalid_dark_fits)
         
         assert info.is_dark() is True
         assert info.validData() is True
@@ -35,9 +37,9 @@ class TestFitsInfoBasic:
 class TestFitsInfoStatistics:
     """Tests pour l'analyse statistique des images"""
     
-    def test_analyze_image_statistics_valid_dark(self, valid_dark_fits):
+    def test_analyze_image_statistics_valid_dark(self, valid_dark_fits, fits_info_cache):
         """Test l'analyse statistique d'un dark valide"""
-        info = FitsInfo(valid_dark_fits)
+        info = fits_info_cache(valid_dark_fits)
         stats = info.analyze_image_statistics()
         
         assert stats is not None
@@ -50,38 +52,49 @@ class TestFitsInfoStatistics:
         assert 10 <= stats['std'] <= 20      # Écart-type autour de 15
         assert stats['hot_pixels_percent'] < 0.1  # Très peu de pixels chauds
 
-    def test_analyze_image_statistics_invalid_dark(self, invalid_dark_fits):
+    def test_analyze_image_statistics_invalid_dark(self, invalid_dark_fits, fits_info_cache):
         """Test l'analyse statistique d'un dark invalide"""
-        info = FitsInfo(invalid_dark_fits)
+        info = fits_info_cache(invalid_dark_fits)
         stats = info.analyze_image_statistics()
         
         assert stats is not None
         assert stats['median'] > 200  # Médiane élevée (lumière)
         assert stats['hot_pixels_percent'] > 0.01  # Plus de pixels chauds
 
+    def test_statistics_computed_once(self, valid_dark_fits, monkeypatch):
+        """Test que les statistiques sont réutilisées entre plusieurs validations"""
+        info = FitsInfo(valid_dark_fits)
+        stats = info.analyze_image_statistics()
+        
+        # L'image ne doit plus être relue pour les validations suivantes
+        monkeypatch.setattr(fits_info.fits, "open", None)
+        assert info.analyze_image_statistics() is stats
+        assert info.is_valid_dark(max_median_adu=50.0)[0] is False
+        assert info.is_valid_dark(max_median_adu=500.0)[0] is True
+
 
 class TestFitsInfoValidation:
     """Tests pour la validation des darks (détection capot ouvert)"""
     
-    def test_valid_dark_validation(self, valid_dark_fits):
+    def test_valid_dark_validation(self, valid_dark_fits, fits_info_cache):
         """Test qu'un dark valide passe la validation"""
-        info = FitsInfo(valid_dark_fits)
+        info = fits_info_cache(valid_dark_fits)
         is_valid, reason = info.is_valid_dark()
         
         assert is_valid is True
         assert reason == "Valid dark frame"
 
-    def test_invalid_dark_validation(self, invalid_dark_fits):
+    def test_invalid_dark_validation(self, invalid_dark_fits, fits_info_cache):
         """Test qu'un dark invalide échoue la validation"""
-        info = FitsInfo(invalid_dark_fits)
+        info = fits_info_cache(invalid_dark_fits)
         is_valid, reason = info.is_valid_dark()
         
         assert is_valid is False
         assert "too high" in reason.lower()
 
-    def test_validation_with_custom_thresholds(self, valid_dark_fits):
+    def test_validation_with_custom_thresholds(self, valid_dark_fits, fits_info_cache):
         """Test la validation avec des seuils personnalisés"""
-        info = FitsInfo(valid_dark_fits)
+        info = fits_info_cache(valid_dark_fits)
         
         # Test avec seuils très stricts
         is_valid, reason = info.is_valid_dark(max_median_adu=50.0)
@@ -95,18 +108,18 @@ class TestFitsInfoValidation:
 class TestFitsInfoGrouping:
     """Tests pour le groupement des darks"""
     
-    def test_group_key_generation(self, valid_dark_fits):
+    def test_group_key_generation(self, valid_dark_fits, fits_info_cache):
         """Test la génération de clés de groupement"""
-        info = FitsInfo(valid_dark_fits)
+        info = fits_info_cache(valid_dark_fits)
         
         # Test avec précision par défaut (0.2°C)
         group_key = info.group_key()
         expected = "TestCamera_T-15.0_E300_G125_B1x1"
         assert group_key == expected
 
-    def test_group_key_temperature_precision(self, valid_dark_fits):
+    def test_group_key_temperature_precision(self, valid_dark_fits, fits_info_cache):
         """Test l'effet de la précision de température sur le groupement"""
-        info = FitsInfo(valid_dark_fits)
+        info = fits_info_cache(valid_dark_fits)
         
         # Test avec différentes précisions
         key_02 = info.group_key(temperature_precision=0.2)
@@ -115,10 +128,22 @@ class TestFitsInfoGrouping:
         assert "T-15.0_" in key_02
         assert "T-15.0_" in key_10  # -15.0 arrondi à 1.0 reste -15.0
 
-    def test_is_equivalent_same_group(self, sample_dark_group):
+    def test_group_key_follows_setters(self, valid_dark_fits):
+        """Test que la clé mémorisée est recalculée après modification des champs"""
+        info = FitsInfo(valid_dark_fits)
+        assert info.group_key(0.2) == "TestCamera_T-15.0_E300_G125_B1x1"
+        
+        copy = info.copy_with_filepath("/tmp/copie.fit")
+        info.set_temperature(-10.0)
+        info.set_gain(100)
+        
+        assert info.group_key(0.2) == "TestCamera_T-10.0_E300_G100_B1x1"
+        assert copy.group_key(0.2) == "TestCamera_T-15.0_E300_G125_B1x1"
+
+    def test_is_equivalent_same_group(self, sample_dark_group, fits_info_cache):
         """Test que des darks du même groupe sont équivalents"""
-        info1 = FitsInfo(sample_dark_group[0])
-        info2 = FitsInfo(sample_dark_group[1])
+        info1 = fits_info_cache(sample_dark_group[0])
+        info2 = fits_info_cache(sample_dark_group[1])
         
         # Avec précision de température élevée, ils devraient être équivalents
         assert info1.is_equivalent(info2, temperature_precision=1.0) is True
@@ -131,9 +156,9 @@ class TestFitsInfoGrouping:
 class TestFitsInfoValidationReport:
     """Tests pour les rapports de validation"""
     
-    def test_validation_report_structure(self, valid_dark_fits):
+    def test_validation_report_structure(self, valid_dark_fits, fits_info_cache):
         """Test la structure du rapport de validation"""
-        info = FitsInfo(valid_dark_fits)
+        info = fits_info_cache(valid_dark_fits)
         report = info.get_validation_report()
         
         required_keys = ['filepath', 'is_valid', 'reason', 'statistics', 
@@ -146,9 +171,9 @@ class TestFitsInfoValidationReport:
         assert report['is_valid'] is True
         assert report['statistics'] is not None
 
-    def test_validation_report_invalid_dark(self, invalid_dark_fits):
+    def test_validation_report_invalid_dark(self, invalid_dark_fits, fits_info_cache):
         """Test le rapport de validation pour un dark invalide"""
-        info = FitsInfo(invalid_dark_fits)
+        info = fits_info_cache(invalid_dark_fits)
         report = info.get_validation_report()
         
         assert report['is_valid'] is False
@@ -156,6 +181,58 @@ class TestFitsInfoValidationReport:
         assert report['statistics']['median'] > 200
 
 
+class TestFitsInfoHeaderCache:
+    """Tests pour la mémorisation des en-têtes FITS"""
+    
+    def test_unchanged_file_not_reread(self, valid_dark_fits):
+        """Test qu'un fichier inchangé n'est lu qu'une fois"""
+        fits_info._read_primary_header.cache_clear()
+        
+        FitsInfo(valid_dark_fits)
+        FitsInfo(valid_dark_fits)
+        
+        info = fits_info._read_primary_header.cache_info()
+        assert info.misses == 1
+        assert info.hits == 1
+    
+    def test_updated_header_reread(self, valid_dark_fits, temp_dir):
+        """Test qu'un en-tête mis à jour est relu"""
+        filepath = str(temp_dir / "master.fit")
+        shutil.copy(valid_dark_fits, filepath)
+        info = FitsInfo(filepath)
+        info.set_ndarks(12)
+        info.update_header()
+        
+        assert FitsInfo(filepath).ndarks() == 12
+
+
+class TestFitsInfoSymlink:
+    """Tests pour la création des liens symboliques"""
+    
+    def test_create_symlink_replaces_dangling_link(self, valid_dark_fits, temp_dir):
+        """Test qu'un lien cassé existant est remplacé"""
+        info = FitsInfo(valid_dark_fits)
+        link_dir = temp_dir / "link"
+        link_dir.mkdir()
+        (link_dir / "dark_0001.fit").symlink_to(temp_dir / "absent.fit")
+        
+        link_info = info.create_symlink(str(link_dir), index=1)
+        
+        assert link_info is not None
+        assert link_info.filepath == str(link_dir / "dark_0001.fit")
+        assert (link_dir / "dark_0001.fit").resolve() == Path(valid_dark_fits).resolve()
+    
+    def test_create_symlink_creates_link_dir(self, valid_dark_fits, temp_dir):
+        """Test que le répertoire des liens est créé s'il n'existe pas"""
+        info = FitsInfo(valid_dark_fits)
+        link_dir = temp_dir / "process" / "link"
+        
+        link_info = info.create_symlink(str(link_dir))
+        
+        assert link_info is not None
+        assert (link_dir / "valid_dark.fit").is_symlink()
+
+
 class TestFitsInfoErrorHandling:
     """Tests pour la gestion d'erreurs"""
     
@@ -166,9 +243,9 @@ class TestFitsInfoErrorHandling:
         assert info.validData() is False
         assert info.analyze_image_statistics() is None
 
-    def test_bias_frame_validation(self, bias_fits):
+    def test_bias_frame_validation(self, bias_fits, fits_info_cache):
         """Test qu'un bias n'est pas validé comme dark"""
-        info = FitsInfo(bias_fits)
+        info = fits_info_cache(bias_fits)
         
         assert info.is_dark() is False
         assert info.is_bias() is True
@@ -1,58 +1,39 @@
-#!/usr/bin/env python3
 """
-Script de démonstration pour tester l'option --force-recalc
+Tests de l'option --force-recalc
+Vérifie la prise en compte de force_recalc par DarkLib, avec ou sans recalcul forcé.
 """
-
 import os
-import sys
-import tempfile
-import shutil
-import logging
-sys.path.append('lib')
-
-from darkprocess import DarkLib
-from config import Config
-
-def create_demo():
-    """Crée une démonstration de l'option --force-recalc"""
-    
-    print("=== Démonstration de l'option --force-recalc ===\n")
-    
-    # Configuration avec force_recalc à False
-    config = Config()
-    config.set('temperature_precision', 0.2)
-    config.set('force_recalc', False)
-    
-    print("1. Configuration initiale:")
-    print(f"   - Précision température: {config.get('temperature_precision')}°C")
-    print(f"   - Force recalcul: {config.get('force_recalc')}")
-    
-    # Créer une instance DarkLib
-    darklib = DarkLib(config, force_recalc=False)
-    
-    print(f"\n2. Instance DarkLib créée:")
-    print(f"   - Répertoire de bibliothèque: {darklib.dark_library_path}")
-    print(f"   - Force recalcul: {darklib.force_recalc}")
-    
-    # Maintenant avec force_recalc à True
-    config.set('force_recalc', True)
-    darklib_force = DarkLib(config, force_recalc=True)
-    
-    print(f"\n3. Instance DarkLib avec force_recalc=True:")
-    print(f"   - Répertoire de bibliothèque: {darklib_force.dark_library_path}")
-    print(f"   - Force recalcul: {darklib_force.force_recalc}")
-    
-    print(f"\n4. Différence comportementale:")
-    print(f"   - Sans force_recalc: Les master darks existants plus récents que les darks sources sont conservés")
-    print(f"   - Avec force_recalc: Tous les master darks sont recréés indépendamment de leur âge")
-    
-    print(f"\n5. Cas d'usage de --force-recalc:")
-    print(f"   - Changement de précision de température (ex: 0.2°C → 1.0°C)")
-    print(f"   - Test de nouveaux paramètres de groupement")
-    print(f"   - Validation après modification du code de traitement")
-    print(f"   - Réparation de master darks corrompus")
-    
-    print(f"\n=== Fin de la démonstration ===")
-
-if __name__ == "__main__":
-    create_demo()
\ No newline at end of file
+import pytest
+
+from lib.darkprocess import DarkLib
+
+
+@pytest.fixture
+def force_recalc_config(config_instance, temp_dir):
+    """Configuration partagée par les deux variantes de force_recalc"""
+    config_instance.set('dark_library_path', str(temp_dir / "darklib"))
+    config_instance.set('work_dir', str(temp_dir / "work"))
+    config_instance.set('temperature_precision', 0.2)
+    return config_instance
+
+
+@pytest.mark.parametrize("force_recalc", [False, True])
+class TestForceRecalc:
+    """Tests de DarkLib avec et sans recalcul forcé des master darks"""
+
+    def test_darklib_creation(self, force_recalc_config, native_siril, force_recalc):
+        """Test que l'option est transmise à DarkLib avec la configuration"""
+        force_recalc_config.set('force_recalc', force_recalc)
+        darklib = DarkLib(force_recalc_config, force_recalc=force_recalc)
+
+        assert darklib.force_recalc is force_recalc
+        assert darklib.temperature_precision == 0.2
+        assert darklib.dark_library_path == force_recalc_config.get('dark_library_path')
+        assert os.path.isdir(darklib.dark_library_path)
+
+    def test_library_not_scanned_at_creation(self, force_recalc_config, native_siril, force_recalc):
+        """Test que la bibliothèque n'est lue qu'au premier besoin, pas à la création"""
+        darklib = DarkLib(force_recalc_config, force_recalc=force_recalc)
+
+        assert darklib._existing_master_darks is None
+        assert darklib.read_existing_master_darks() == []
@@ -0,0 +1,207 @@
+"""
+Tests unitaires pour le module lightprocessor.py
+Tests la préparation des séquences Siril (liens vers les fichiers light).
+"""
+import os
+import shutil
+import pytest
+
+from lib.fits_info import FitsInfo
+from lib.lightprocessor import LightProcessor
+
+
+@pytest.fixture
+def processor(temp_dir, native_siril):
+    """LightProcessor sur une session contenant trois fichiers light"""
+    session_dir = temp_dir / "session"
+    light_dir = session_dir / "light"
+    light_dir.mkdir(parents=True)
+    for i in range(3):
+        (light_dir / f"light_{i:02d}.fit").write_bytes(b"")
+
+    return LightProcessor(
+        session_dir=session_dir,
+        dark_library_path=None,
+        output_dir=temp_dir / "output",
+        work_dir=temp_dir / "work",
+    )
+
+
+class TestPrepareSequence:
+    """Tests pour la préparation des séquences"""
+
+    def test_links_follow_siril_convention(self, processor):
+        """Test que les liens sont nommés selon la convention Siril"""
+        light_files = processor.find_light_files()
+
+        assert processor._prepare_sequence("seq", light_files) is True
+
+        sequence_dir = processor.work_dir / "seq"
+        names = sorted(os.listdir(sequence_dir))
+        assert names == ["seq_0000.fit", "seq_0001.fit", "seq_0002.fit"]
+        for i, name in enumerate(names):
+            assert os.path.samefile(sequence_dir / name, light_files[i])
+
+    def test_hard_links_on_same_filesystem(self, processor):
+        """Test que des liens physiques sont créés lorsque sources et séquence partagent le système de fichiers"""
+        light_files = processor.find_light_files()
+
+        assert processor._prepare_sequence("seq", light_files) is True
+
+        link_path = processor.work_dir / "seq" / "seq_0000.fit"
+        assert not link_path.is_symlink()
+        assert os.stat(link_path).st_nlink == 2
+
+    def test_existing_links_replaced(self, processor):
+        """Test qu'une séquence peut être préparée à nouveau, même avec un lien cassé"""
+        light_files = processor.find_light_files()
+        sequence_dir = processor.work_dir / "seq"
+        sequence_dir.mkdir(parents=True)
+        os.symlink("/path/that/does/not/exist.fit", sequence_dir / "seq_0000.fit")
+
+        assert processor._prepare_sequence("seq", light_files) is True
+        assert os.path.samefile(sequence_dir / "seq_0000.fit", light_files[0])
+
+    def test_braces_in_sequence_name(self, processor):
+        """Test qu'un nom de séquence contenant des accolades est utilisé tel quel"""
+        assert processor._prepare_sequence("seq_{x}", processor.find_light_files()) is True
+        assert (processor.work_dir / "seq_{x}" / "seq_{x}_0000.fit").exists()
+
+    def test_missing_source_rejected(self, processor, caplog):
+        """Test qu'un fichier source manquant fait échouer la préparation"""
+        light_files = processor.find_light_files()
+        missing = processor.session_dir / "light" / "missing.fit"
+
+        assert processor._prepare_sequence("seq", light_files + [missing]) is False
+        assert f"Fichier source inexistant: {missing}" in caplog.text
+
+    def test_cleanup_removes_sequence(self, processor):
+        """Test que le nettoyage supprime le répertoire de séquence"""
+        processor._prepare_sequence("seq", processor.find_light_files())
+
+        processor._cleanup_sequence("seq")
+
+        assert not (processor.work_dir / "seq").exists()
+        assert all(os.path.exists(f) for f in processor.find_light_files())
+
+    def test_cleanup_unexpected_content(self, processor):
+        """Test que le nettoyage supprime aussi un contenu inattendu (sous-répertoire)"""
+        processor._prepare_sequence("seq", processor.find_light_files())
+        (processor.work_dir / "seq" / "sub").mkdir()
+
+        processor._cleanup_sequence("seq")
+
+        assert not (processor.work_dir / "seq").exists()
+
+    def test_cleanup_missing_sequence(self, processor):
+        """Test que le nettoyage d'une séquence absente est sans effet"""
+        processor._cleanup_sequence("absente")
+
+    def test_relative_sources_resolved(self, processor, monkeypatch):
+        """Test que les chemins relatifs sont résolus par rapport au répertoire courant"""
+        monkeypatch.chdir(processor.session_dir)
+        light_files = ["light/light_00.fit", "light/light_01.fit"]
+
+        source_paths = LightProcessor._resolve_sources(light_files)
+
+        assert source_paths == [(processor.session_dir / f).resolve() for f in light_files]
+        assert processor._find_missing_sources(source_paths) == []
+
+
+class TestStackParams:
+    """Tests pour la normalisation des paramètres de stacking"""
+
+    def test_defaults_when_missing(self):
+        """Test que l'absence de paramètres donne les valeurs par défaut"""
+        assert LightProcessor._normalize_stack_params(None) == LightProcessor.DEFAULT_STACK_PARAMS
+
+    def test_partial_params_completed(self):
+        """Test que des paramètres partiels sont complétés sans modifier l'original"""
+        params = {"rejection": "winsorized", "rejection_high": 2.5}
+
+        normalized = LightProcessor._normalize_stack_params(params)
+
+        assert normalized["rejection"] == "winsorized"
+        assert normalized["rejection_low"] == 3.0
+        assert normalized["rejection_high"] == 2.5
+        assert params == {"rejection": "winsorized", "rejection_high": 2.5}
+
+
+class TestConversionReuse:
+    """Tests pour la réutilisation d'une séquence déjà convertie"""
+
+    def _simulate_conversion(self, processor, sequence_name, light_files):
+        """Crée les fichiers qu'aurait produits une conversion Siril réussie"""
+        process_dir = processor.work_dir / "process"
+        process_dir.mkdir(parents=True)
+        (process_dir / f"{sequence_name}_.seq").write_text("")
+        for i in range(1, len(light_files) + 1):
+            (process_dir / f"{sequence_name}_{i:05d}.fit").write_bytes(b"")
+        (process_dir / f"{sequence_name}.sources").write_text(processor._conversion_manifest(light_files))
+
+    def test_no_previous_conversion(self, processor):
+        """Test qu'en l'absence de conversion précédente, la conversion est nécessaire"""
+        assert not processor._is_conversion_reusable("seq", processor.find_light_files())
+
+    def test_same_sources_reused(self, processor):
+        """Test qu'une conversion des mêmes fichiers est réutilisée"""
+        light_files = processor.find_light_files()
+        self._simulate_conversion(processor, "seq", light_files)
+
+        assert processor._is_conversion_reusable("seq", light_files)
+
+    def test_different_sources_not_reused(self, processor):
+        """Test qu'une conversion d'autres fichiers n'est pas réutilisée"""
+        light_files = processor.find_light_files()
+        self._simulate_conversion(processor, "seq", light_files)
+
+        assert not processor._is_conversion_reusable("seq", light_files[:2])
+
+    def test_modified_source_not_reused(self, processor):
+        """Test qu'une conversion n'est pas réutilisée si un fichier source a changé"""
+        light_files = processor.find_light_files()
+        self._simulate_conversion(processor, "seq", light_files)
+        with open(light_files[0], "wb") as f:
+            f.write(b"nouveau contenu")
+
+        assert not processor._is_conversion_reusable("seq", light_files)
+
+    def test_script_without_convert(self, processor):
+        """Test que le script généré omet la conversion lorsqu'elle est réutilisée"""
+        script = processor._generate_siril_script("seq", "groupe", "/darks/master.fit", skip_convert=True)
+
+        assert "\nconvert " not in script
+        assert f"cd {processor.work_dir / 'process'}\n" in script
+        assert "\ncalibrate seq " in script
+
+
+class TestFindMatchingMasterDark:
+    """Tests pour la recherche du master dark correspondant"""
+
+    @pytest.fixture
+    def dark_library(self, processor, valid_dark_fits, bias_fits, temp_dir):
+        """Librairie contenant un master dark et un bias"""
+        library = temp_dir / "darklib"
+        library.mkdir()
+        shutil.copy(valid_dark_fits, library / "master_dark.fit")
+        shutil.copy(bias_fits, library / "bias.fit")
+        processor.dark_library_path = str(library)
+        return library
+
+    def test_matching_dark_found(self, processor, dark_library, valid_dark_fits):
+        """Test qu'un light de mêmes caractéristiques trouve son master dark"""
+        light_info = FitsInfo(valid_dark_fits)
+
+        assert processor.find_matching_master_dark(light_info) == dark_library / "master_dark.fit"
+
+    def test_no_matching_dark(self, processor, dark_library, bias_fits):
+        """Test qu'aucun master dark n'est retourné pour d'autres caractéristiques"""
+        assert processor.find_matching_master_dark(FitsInfo(bias_fits)) is None
+
+    def test_library_scanned_once(self, processor, dark_library, valid_dark_fits):
+        """Test que la librairie n'est parcourue qu'une fois pour plusieurs recherches"""
+        light_info = FitsInfo(valid_dark_fits)
+        processor.find_matching_master_dark(light_info)
+        (dark_library / "master_dark.fit").rename(dark_library / "ignored.txt")
+
+        assert processor.find_matching_master_dark(light_info) == dark_library / "master_dark.fit"
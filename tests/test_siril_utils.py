@@ -0,0 +1,158 @@
+"""
+Tests unitaires pour le module siril_utils.py
+Tests la validation de la configuration Siril et son cache.
+"""
+import os
+import sys
+import logging
+import pytest
+
+from lib import siril_utils
+from lib.siril_utils import Siril
+
+
+@pytest.fixture
+def scripted_siril(temp_dir):
+    """
+    Exécutable factice interprétant les scripts : affiche les messages pyscript
+    et s'arrête en erreur sur une commande 'fail', comme Siril sur une commande en échec.
+    """
+    filepath = temp_dir / "scripted_siril"
+    filepath.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        "for line in open(sys.argv[2]):\n"
+        "    if line.startswith('fail'):\n"
+        "        sys.exit(1)\n"
+        "    if line.startswith('pyscript'):\n"
+        "        print(line.split('\"')[1])\n"
+    )
+    os.chmod(filepath, 0o755)
+    return str(filepath)
+
+
+@pytest.fixture(autouse=True)
+def clear_validation_cache():
+    """Chaque test démarre avec un cache de validation vide"""
+    Siril.invalidate_validation_cache()
+    yield
+    Siril.invalidate_validation_cache()
+
+
+class TestSirilValidationCache:
+    """Tests pour la mémorisation de la validation"""
+
+    def test_validation_is_cached(self, fake_siril):
+        """Test que la validation n'est exécutée qu'une fois par couple (path, mode)"""
+        Siril(siril_path=fake_siril, siril_mode="native")
+        Siril(siril_path=fake_siril, siril_mode="native")
+
+        info = siril_utils._validate.cache_info()
+        assert info.misses == 1
+        assert info.hits == 1
+
+    def test_invalidate_validation_cache(self, fake_siril):
+        """Test que l'invalidation force une nouvelle validation"""
+        siril = Siril(siril_path=fake_siril, siril_mode="native")
+        os.chmod(fake_siril, 0o644)
+
+        # Résultat mémorisé : le changement n'est pas encore visible
+        assert Siril(siril_path=fake_siril, siril_mode="native").is_validated
+
+        Siril.invalidate_validation_cache()
+        with pytest.raises(ValueError):
+            Siril(siril_path=fake_siril, siril_mode="native")
+        assert siril.is_validated
+
+    def test_invalid_mode_rejected(self, fake_siril):
+        """Test qu'un mode invalide est rejeté"""
+        with pytest.raises(ValueError):
+            Siril(siril_path=fake_siril, siril_mode="mode_inexistant")
+
+    def test_command_found_in_path(self):
+        """Test qu'un nom de commande nu est recherché dans le PATH"""
+        assert Siril(siril_path="sh", siril_mode="native").is_validated
+
+    def test_command_name_ignores_current_dir(self, temp_dir, monkeypatch):
+        """Test qu'un nom nu est cherché dans le PATH même si le répertoire courant contient ce nom"""
+        (temp_dir / "sh").mkdir()
+        monkeypatch.chdir(temp_dir)
+        assert Siril(siril_path="sh", siril_mode="native").is_validated
+
+    def test_path_lookup_follows_path_changes(self, fake_siril, monkeypatch):
+        """Test que la recherche dans le PATH est refaite lorsque le PATH change"""
+        monkeypatch.setenv("PATH", os.path.dirname(fake_siril))
+        assert siril_utils._which_cached("siril", os.environ.get("PATH"), None) == fake_siril
+
+        monkeypatch.setenv("PATH", os.path.join(os.path.dirname(fake_siril), "vide"))
+        assert siril_utils._which_cached("siril", os.environ.get("PATH"), None) is None
+
+    def test_missing_executable_rejected(self, temp_dir):
+        """Test qu'un chemin inexistant est rejeté sans recherche dans le PATH"""
+        with pytest.raises(ValueError):
+            Siril(siril_path=str(temp_dir / "sh"), siril_mode="native")
+
+    def test_directory_rejected(self, temp_dir):
+        """Test qu'un répertoire n'est pas accepté comme exécutable"""
+        with pytest.raises(ValueError):
+            Siril(siril_path=str(temp_dir), siril_mode="appimage")
+
+    def test_setter_revalidates(self, fake_siril):
+        """Test que le setter de mode re-valide et restaure la valeur en cas d'échec"""
+        siril = Siril(siril_path=fake_siril, siril_mode="native")
+
+        with pytest.raises(ValueError):
+            siril.siril_mode = "mode_invalide"
+        assert siril.siril_mode == "native"
+        assert siril.is_validated
+
+    def test_setter_keeps_other_cached_configurations(self, fake_siril):
+        """Test que le setter revérifie la nouvelle valeur sans vider le cache des autres configurations"""
+        siril = Siril(siril_path=fake_siril, siril_mode="native")
+        Siril(siril_path="sh", siril_mode="native")
+        cached = siril_utils._validate.cache_info().currsize
+
+        siril.siril_path = "sh"
+
+        assert siril.siril_path == "sh"
+        assert siril_utils._validate.cache_info().currsize == cached
+
+    def test_configure_defaults_restores_on_failure(self, native_siril, temp_dir):
+        """Test qu'une configuration par défaut invalide laisse l'ancienne en place"""
+        with pytest.raises(ValueError):
+            Siril.configure_defaults(siril_path=str(temp_dir / "absent"))
+        assert Siril.get_default_config() == (native_siril, "native")
+
+
+class TestRunSirilScriptCompat:
+    """Tests pour la fonction de compatibilité run_siril_script"""
+
+    def test_instance_is_reused(self, fake_siril, temp_dir):
+        """Test que la même instance Siril est réutilisée entre deux appels"""
+        assert siril_utils.run_siril_script("requires 1.2\n", str(temp_dir), fake_siril, "native")
+        assert siril_utils.run_siril_script("requires 1.2\n", str(temp_dir), fake_siril, "native")
+
+        info = siril_utils._get_siril.cache_info()
+        assert info.misses == 1
+        assert info.hits == 1
+
+
+class TestRunSirilScript:
+    """Tests pour l'exécution d'un script"""
+
+    def test_failure_logs_output_tail(self, scripted_siril, temp_dir, caplog):
+        """Test qu'en cas d'échec, la fin de la sortie de Siril est journalisée"""
+        siril = Siril(siril_path=scripted_siril, siril_mode="native")
+        script = 'pyscript pyecho.py "avant échec"\nfail\n'
+
+        with caplog.at_level(logging.ERROR):
+            assert siril.run_siril_script(script, str(temp_dir)) is False
+
+        assert "avant échec" in caplog.text
+
+    def test_script_file_removed(self, scripted_siril, temp_dir):
+        """Test que le script temporaire est supprimé après exécution"""
+        siril = Siril(siril_path=scripted_siril, siril_mode="native")
+
+        assert siril.run_siril_script("convert a\n", str(temp_dir)) is True
+        assert not list(temp_dir.glob("*.sps"))